@@ -1,8 +1,85 @@
-from Components.BasicComponent import Component
+"""This module implements the crossbar components that arbitrate between packets from several upstream
+    units towards one or more downstream units"""
+
+from Components.BasicComponent import Component, BwStats
+import logging
 from simpyExtensions.util import CrossbarGet, NewEvent
 import random
+from array import array
+from collections import deque
 from SimSettings import simTicksPerCycle
-from statistics import mean
+from math import isnan, nan
+from operator import mul, truediv
+from itertools import repeat
+
+#-----------------------------------------------------------------
+# Arbitration kernels: pure functions over the per-inPort state so the
+# crossbar classes below only carry the simpy and logging glue.
+# Unmasked inPorts are passed as a bitmask: bit i is set if inPort i competes.
+#-----------------------------------------------------------------
+
+def _maskPorts(mask):
+
+    """returns the list of inPorts whose bit is set in mask, in ascending order"""
+
+    ports=[]
+    while mask:
+        bit=mask & -mask
+        ports.append(bit.bit_length()-1)
+        mask^=bit
+    return ports
+
+def _wrrArbitrate(mask, weights, grants, last):
+
+    """weighted round robin selection among the inPorts set in mask, starting from the
+        last granted port (last). Exhausted grant counters are reset in place.
+        Returns the selected inPort or None"""
+
+    n=len(weights)
+    candidate=last%n
+    selectedCandidate=None
+
+    for count in range(n):
+
+        if mask>>candidate & 1:
+
+            if weights[candidate]>grants[candidate]:
+                return candidate
+
+            elif selectedCandidate is None:
+                selectedCandidate=candidate
+
+            if grants[candidate]==weights[candidate]:
+                grants[candidate]=0
+
+        candidate=(candidate+1)%n
+
+    return selectedCandidate
+
+def _fixedPriorityArbitrate(mask, classMasks, lastportPerClass, outPort, inPorts):
+
+    """round robin selection among the inPorts set in mask that belong to the highest
+        priority class present, starting after the last port granted to outPort in that class.
+        classMasks[c] is the bitmask of the inPorts of priority class c.
+        Returns a tuple (selected inPort or None, priority class or None)"""
+
+    for priorityClass in range(len(classMasks)-1,-1,-1):
+        classMask=mask & classMasks[priorityClass]
+        if classMask:
+            break
+    else:
+        return None, None
+
+    candidate=(lastportPerClass[priorityClass][outPort]+1)%inPorts
+
+    for count in range(inPorts):
+
+        if classMask>>candidate & 1:
+            return candidate, priorityClass
+
+        candidate=(candidate+1)%inPorts
+
+    return None, priorityClass
 
 class Crossbar(Component):
 
@@ -16,41 +93,42 @@ class Crossbar(Component):
         self.inPorts=inPorts
         self.outPorts=outPorts
         self.pushMode=pushMode
+
         self.peekEvents=[None]*self.inPorts
         self.unMaskEvents=[None]*self.inPorts
 
         self.routes=[None]*self.inPorts #stores the destination outPort of packets on inPorts (None is no packets)
         self.routedPktList=[None]*self.inPorts #stores the modified packet due to routing on each inPort, or simply the original packet
+        self._routedMask=[0]*self.outPorts #per outPort, bitmask of the inPorts holding a packet routed to it
         self.lastport=[-1]*self.outPorts
+        self._upstreams=[] #the upstream unit on each inPort, resolved once connections are made
+        self._downstreams=[] #the downstream unit on each outPort, resolved once connections are made
+        self._inPortNames=[] #names of the upstream units on each inPort
+        self._outPortNames=[] #names of the downstream units on each outPort
 
         self.get_queues=[]
         for i in range(self.outPorts):
-            self.get_queues.append([])
+            self.get_queues.append(deque())
 
         self.arbEvents=[None]*self.outPorts
+        self._eventPool=[[] for outPort in range(self.outPorts)] #per outPort, processed arbitration/cleanup events ready for reuse
         self.monitorBW=monitorBW
         self.monitorInterval=monitorInterval*simTicksPerCycle
         self.timeSamples=[]
-        self.totalBitsSent=[]
-        self.lastActivity=[]
-        self.firstActivity=[]
-        self.bw=[]
-
-        for inPort in  range(self.inPorts):
-            self.lastActivity.append([])
-            self.firstActivity.append([])
-            self.totalBitsSent.append([])
-            self.bw.append([])
-
-            for outPort in range(self.outPorts):
-                self.lastActivity[inPort].append(None)
-                self.firstActivity[inPort].append(None)
-                self.totalBitsSent[inPort].append(0)
-                self.bw[inPort].append([])
+
+        # per (inPort,outPort) pair statistics, stored flat and indexed by inPort*outPorts+outPort
+        pairs=self.inPorts*self.outPorts
+        self.totalBitsSent=array('q',[0]*pairs)
+        self.lastActivity=array('d',[nan])*pairs #nan until the pair has carried a packet
+        self.firstActivity=array('d',[nan])*pairs
+        self.bw=array('d') #one row of per pair bandwidth samples appended per monitoring interval
+        self._bwSum=array('d',[0.0])*pairs #per pair running sum of the bandwidth samples, so dumpStats() needs no rescan of self.bw
+        self._bwSqSum=array('d',[0.0])*pairs #per pair running sum of the squared samples
+        self._bwMax=array('d',[0.0])*pairs #per pair largest sample
 
     def route(self, peekEvent):
 
-        inPort=self.peekEvents.index(peekEvent) #the inPort at which the packet was detected
+        inPort=peekEvent.inPort #the inPort at which the packet was detected
         pkt=peekEvent.value  # the original packet before 
 
         #------Customizable Routing Routine ----–--#
@@ -65,9 +143,8 @@ class Crossbar(Component):
         #-----maintaining list of routed packets and their destinations---#
         self.routes[inPort]=outPort
         self.routedPktList[inPort]=pkt
-        inPortName=self.toUp[inPort].name if self.inPorts>1 else self.toUp.name
-        outPortName=self.toDn[outPort].name if self.outPorts>1 else self.toDn.name
-        self.Log('DEBUG','Packet {} from {} was routed to {}'.format(pkt.uid, inPortName, outPortName))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.Log('DEBUG','Packet {} from {} was routed to {}'.format(pkt.uid, self._inPortNames[inPort], self._outPortNames[outPort]))
 
     def unMask(self,pkt,outport):
 
@@ -83,12 +160,14 @@ class Crossbar(Component):
         """
         return NewEvent(self.env).succeed()
 
-    def arbitratePkts(self,pktList, outPort=0):
+    def arbitratePkts(self,activeMask, outPort=0):
         """ a customizable function that performs the arbitration between unmasked packets.
+            activeMask is a bitmask of the inPorts whose packet (see routedPktList) is unmasked
+            for outPort: bit i is set if inPort i competes.
             the default is to choose a random input port to proceed to the outPort passed as
             argument"""
 
-        activeports=[i for i, pkt in enumerate(pktList) if pkt != None]
+        activeports=_maskPorts(activeMask)
 
         if activeports:
             candidate=random.choice(activeports)
@@ -99,12 +178,13 @@ class Crossbar(Component):
 
     def postDecisionMsg(self,candidate):
 
-        inPortName=self.toUp[candidate].name if self.inPorts>1 else self.toUp.name
-        outPortName=self.toDn[self.routes[candidate]].name if self.outPorts>1 else self.toDn.name                
-        self.Log("INFO", "Random Arbitration elected packet {} from {} to proceed towards {}".format(self.routedPktList[candidate].uid, inPortName, outPortName))
+        if self.logger.isEnabledFor(logging.INFO):
+            self.Log("INFO", "Random Arbitration elected packet {} from {} to proceed towards {}".format(self.routedPktList[candidate].uid, self._inPortNames[candidate], self._outPortNames[self.routes[candidate]]))
 
     def run(self):
         
+        self._resolvePorts()
+
         if self.monitorBW:
             self.env.process(self.bwMonitor())
 
@@ -118,44 +198,53 @@ class Crossbar(Component):
         else:
             yield self.env.timeout(1)
 
-    def run_init(self):
-        
-        if self.inPorts==1:
+    def _resolvePorts(self):
 
-            self.peekEvents=[self.toUp.peek(0,caller=self)]
+        """caches the units connected to each in/outPort, and their names, as lists indexed by port
+            whether toUp/toDn hold a single unit or a dictionary of them. Called once the topology
+            is wired up so that the per packet code does not branch on the number of ports"""
 
-        else:
-            self.peekEvents=[self.toUp[inPort].peek(inPort,caller=self) for inPort in range(self.inPorts)]
+        self._upstreams=[self.toUp[inPort] for inPort in range(self.inPorts)] if self.inPorts>1 else [self.toUp]
+        self._downstreams=[self.toDn[outPort] for outPort in range(self.outPorts)] if self.outPorts>1 else [self.toDn]
+        self._inPortNames=[upstream.name for upstream in self._upstreams]
+        self._outPortNames=[downstream.name for downstream in self._downstreams]
+
+    def run_init(self):
+        
+        self.peekEvents=[self._peek(inPort) for inPort in range(self.inPorts)]
 
         for inPort in range(self.inPorts):
 
             if self.peekEvents[inPort].triggered:
-                self.route(self.peekEvents[inPort])
                 self._postPeekProcessing(self.peekEvents[inPort])
 
             else:
                 self.peekEvents[inPort].callbacks.append(self._postPeekProcessing)
 
+    def _peek(self, inPort):
+
+        """issues a peek onto the upstream unit of inPort and tags the returned event with
+            the inPort so that its callbacks need no lookup"""
+
+        peekEvent=self._upstreams[inPort].peek(inPort,caller=self)
+        peekEvent.inPort=inPort
+        return peekEvent
+
     def runOutPort(self,outPort):
 
         while True:
             
             pkt= yield self.get(outPort)
             inPort=self.lastport[outPort]
+            pair=inPort*self.outPorts+outPort
             
-            if self.firstActivity[inPort][outPort]==None:
-                self.firstActivity[inPort][outPort]=self.env.now
-
-            caller=self.toUp[inPort] if self.inPorts>1 else self.toUp
-            if self.outPorts>1:
-                yield self.toDn[outPort].put(pkt,caller=caller)
-
-            else:
+            if isnan(self.firstActivity[pair]):
+                self.firstActivity[pair]=self.env.now
 
-                yield self.toDn.put(pkt,caller=caller)
+            yield self._downstreams[outPort].put(pkt,caller=self._upstreams[inPort])
 
-            self.totalBitsSent[inPort][outPort]+=8*pkt.getBytes()
-            self.lastActivity[inPort][outPort]=self.env.now
+            self.totalBitsSent[pair]+=8*pkt.getBytes()
+            self.lastActivity[pair]=self.env.now
 
     def get(self, outPort=0):
 
@@ -163,62 +252,72 @@ class Crossbar(Component):
 
     def _postPeekProcessing(self,peekEvent):
 
-        inPort=self.peekEvents.index(peekEvent)
+        # a peek is only (re)issued onto an inPort once its previous packet has been cleaned up
+        inPort=peekEvent.inPort
+        assert self.routes[inPort] is None, "inPort {} peeked while still holding a routed packet".format(inPort)
 
-        if self.routes[inPort]==None:
+        self.route(peekEvent)
+        self._refreshUnMask(inPort)
 
-            self.route(peekEvent)
+    def _refreshUnMask(self,inPort):
+
+        """creates a new unMask event for the packet routed on inPort and schedules an arbitration
+            for its outPort if any packet routed there is unMasked"""
 
         outPort=self.routes[inPort]
         pkt=self.routedPktList[inPort]
+        self._routedMask[outPort]|=1<<inPort
 
-        #create unmask event
-        self.unMaskEvents[inPort]=self.unMask(pkt,outPort)
-
-        outPortName=self.toDn[outPort].name if self.outPorts>1 else self.toDn.name
-        inPortName=self.toUp[inPort].name if self.inPorts>1 else self.toUp.name
+        #create unmask event, tagged with the inPort it was created for
+        unMaskEvents=self.unMaskEvents
+        unMaskEvent=self.unMask(pkt,outPort)
+        unMaskEvent.inPort=inPort
+        unMaskEvents[inPort]=unMaskEvent
 
-        self.Log('DEBUG','Creating unMask event ({}) for packet {} to proceed from {} to {}.'\
-            .format(type(self.unMaskEvents[inPort]).__name__, pkt.uid, inPortName, outPortName )) 
+        debug=self.logger.isEnabledFor(logging.DEBUG)
 
-        activeInPorts=[inPort for inPort in range(self.inPorts) if (self.routes[inPort]==outPort)]
+        if debug:
+            self.Log('DEBUG','Creating unMask event ({}) for packet {} to proceed from {} to {}.'\
+                .format(type(unMaskEvent).__name__, pkt.uid, self._inPortNames[inPort], self._outPortNames[outPort] )) 
 
         arbScheduled=False
 
-        for inPort in activeInPorts:
+        for inPort in _maskPorts(self._routedMask[outPort]):
+
+            unMaskEvent=unMaskEvents[inPort]
 
-            if self.unMaskEvents[inPort].triggered:
+            if unMaskEvent.triggered:
                 arbScheduled=True
 
                 if not self.arbEvents[outPort]:
-                    self._schedule_arbitration(self.unMaskEvents[inPort])
+                    self._schedule_arbitration(unMaskEvent)
 
-                    self.Log('DEBUG','One or more Packets for outPort {} are unMasked. Arbitration will now proceed'\
-                        .format(outPortName)) 
+                    if debug:
+                        self.Log('DEBUG','One or more Packets for outPort {} are unMasked. Arbitration will now proceed'\
+                            .format(self._outPortNames[outPort])) 
                 break
 
             else:
-                self.unMaskEvents[inPort].callbacks.append(self._schedule_arbitration) 
+                unMaskEvent.callbacks.append(self._schedule_arbitration) 
 
 
-        if not arbScheduled:
+        if not arbScheduled and debug:
 
             self.Log('DEBUG','No unMasked Packets for outPort {}. Adding callbacks to schedule an arbitration Once any packet is unMasked.'\
-                .format(outPortName)) 
+                .format(self._outPortNames[outPort])) 
 
     def _schedule_arbitration(self, unMaskEvent):
 
-        if unMaskEvent not in self.unMaskEvents:
+        unMaskedPort=unMaskEvent.inPort
+
+        if self.unMaskEvents[unMaskedPort] is not unMaskEvent:
             return
 
-        unMaskedPort=self.unMaskEvents.index(unMaskEvent)
         outPort=self.routes[unMaskedPort]
 
         if not self.arbEvents[outPort] and self.get_queues[outPort]:
-            self.arbEvents[outPort]=NewEvent(self.env,outPort)
-            self.arbEvents[outPort].callbacks.append(self._do_get)
+            self.arbEvents[outPort]=self._acquireEvent(outPort,self._do_get)
             self.arbEvents[outPort].succeed()
-            outPortName=self.toDn[outPort].name if self.outPorts>1 else self.toDn.name
             # self.Log('DEBUG','unMasked Packets for outPort {} Readily Available. Arbitration will proceed.'\
             #     .format(outPortName)) 
 
@@ -230,39 +329,45 @@ class Crossbar(Component):
         if not self.get_queues[outPort]:
             return
         
-        unMaskedInPorts=[inPort for inPort in range(self.inPorts) if (self.routes[inPort]==outPort and self.unMaskEvents[inPort].triggered)]
-        pktList=[(self.routedPktList[inPort] if inPort in unMaskedInPorts else None) for inPort in range(self.inPorts)]
+        #bitmask of the inPorts with an unMasked packet routed to outPort
+        unMaskEvents=self.unMaskEvents
+        unMaskedMask=0
+        routedMask=self._routedMask[outPort]
+        while routedMask:
+            bit=routedMask & -routedMask
+            if unMaskEvents[bit.bit_length()-1].triggered:
+                unMaskedMask|=bit
+            routedMask^=bit
         
-        if any(pktList):
+        if unMaskedMask:
             previous=self.lastport[outPort]
-            chosenPort=self.arbitratePkts(pktList,outPort)
+            chosenPort=self.arbitratePkts(unMaskedMask,outPort)
             self.postDecisionMsg(chosenPort)
-            pkt=pktList[chosenPort]
+            pkt=self.routedPktList[chosenPort]
 
         else:
             self.Log('FATAL_ERROR','Unexpected empty list of unmasked Packets to proceed to outPort {}'\
                 .format(outPort))
 
-        upstream=self.toUp[chosenPort] if self.inPorts>1 else self.toUp
+        upstream=self._upstreams[chosenPort]
 
         upGet=upstream.get(chosenPort,caller=self)
 
         if upGet:
             preGetDelay=upstream.addPreGetDelay(pkt)
             postGetDelay=upstream.addPostGetDelay(pkt)
-            upstream.Log("DEBUG","PreGetDelay is {} ticks. PostGetDelay is {} ticks".format(preGetDelay,postGetDelay))
-            self.get_queues[outPort][0].succeed(pkt, delay=preGetDelay)
-            self.get_queues[outPort].pop(0)
+            if upstream.logger.isEnabledFor(logging.DEBUG):
+                upstream.Log("DEBUG","PreGetDelay is {} ticks. PostGetDelay is {} ticks".format(preGetDelay,postGetDelay))
+            self.get_queues[outPort].popleft().succeed(pkt, delay=preGetDelay)
 
-            cleanupEvent=NewEvent(self.env,outPort)
-            cleanupEvent.callbacks.append(self._cleanup)
+            cleanupEvent=self._acquireEvent(outPort,self._cleanup)
             cleanupEvent.succeed(chosenPort,delay=preGetDelay+postGetDelay)
         else:
             self.lastport[outPort]=previous
-            cleanupEvent=NewEvent(self.env,outPort)
-            cleanupEvent.callbacks.append(self._cleanup)
+            cleanupEvent=self._acquireEvent(outPort,self._cleanup)
             cleanupEvent.succeed(chosenPort,delay=simTicksPerCycle)
-            self.Log('DEBUG','Arbitration is re-scheduled for the next cycle')
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.Log('DEBUG','Arbitration is re-scheduled for the next cycle')
 
     def _cleanup(self, cleanupEvent):
 
@@ -271,20 +376,23 @@ class Crossbar(Component):
         activatedInPort=cleanupEvent.value
         pkt=self.routedPktList[activatedInPort]
 
-        if activatedInPort==self.lastport[outPort]:
+        debug=self.logger.isEnabledFor(logging.DEBUG)
+
+        if debug and activatedInPort==self.lastport[outPort]:
             self.Log('DEBUG','Finished Sending Packet {} sent from inPort {} towards outPort {}. Cleaning up and refreshing Peek and UnMask Events'\
                 .format(pkt.uid, activatedInPort, outPort))
 
 
         self.routes[activatedInPort]=None
         self.routedPktList[activatedInPort]=None
+        self._routedMask[outPort]&=~(1<<activatedInPort)
         self.unMaskEvents[activatedInPort]=None
+        self._releaseEvent(self.arbEvents[outPort])
         self.arbEvents[outPort]=None
 
-        upstream=self.toUp[activatedInPort] if self.inPorts>1 else self.toUp
-        
-        self.Log('DEBUG','Refreshing Peek onto inPort {}.'.format(activatedInPort))
-        self.peekEvents[activatedInPort]=upstream.peek(activatedInPort,caller=self)
+        if debug:
+            self.Log('DEBUG','Refreshing Peek onto inPort {}.'.format(activatedInPort))
+        self.peekEvents[activatedInPort]=self._peek(activatedInPort)
 
 
         if self.peekEvents[activatedInPort].triggered:
@@ -293,71 +401,98 @@ class Crossbar(Component):
         else:
             self.peekEvents[activatedInPort].callbacks.append(self._postPeekProcessing)
 
-        for inPort in range(self.inPorts):
-            if self.routes[inPort]==outPort and inPort!=activatedInPort:
-                self._postPeekProcessing(self.peekEvents[inPort])
+        for inPort in _maskPorts(self._routedMask[outPort] & ~(1<<activatedInPort)):
+            self._refreshUnMask(inPort)
+
+        self._releaseEvent(cleanupEvent)
+
+    def _acquireEvent(self, outPort, callback):
+
+        """returns an untriggered event for outPort with callback attached, reusing a processed
+            arbitration/cleanup event from the pool of that outPort when one is available"""
+
+        pool=self._eventPool[outPort]
+
+        if pool:
+            event=pool.pop().rearm(outPort,[callback])
+        else:
+            event=NewEvent(self.env,outPort)
+            event.callbacks.append(callback)
+
+        return event
+
+    def _releaseEvent(self, event):
+
+        """returns a processed arbitration/cleanup event to the pool of its outPort (event.item).
+            Only events created by _acquireEvent, which no process waits on, may be released"""
+
+        self._eventPool[event.item].append(event)
 
     def bwMonitor(self):
 
-        lastTotalBitsSent=[]
-        for ip in  range(len(self.totalBitsSent)):
-            lastTotalBitsSent.append([])
-            for op in range(len(self.totalBitsSent[ip])):
-                lastTotalBitsSent[ip].append(0)
-               
-        bw_interval=0
+        lastTotalBitsSent=array('q',[0]*len(self.totalBitsSent)) #scratch snapshot, updated in place
 
         while True:
 
             yield self.env.timeout(self.monitorInterval)
 
-            for ip in  range(len(self.totalBitsSent)):
-                for op in range(len(self.totalBitsSent[ip])):
+            row=[(bits - lastBits) / (self.monitorInterval) for bits, lastBits in zip(self.totalBitsSent, lastTotalBitsSent)]
+            self.bw.extend(row)
+            for pair,bw in enumerate(row):
+                if bw:
+                    self._bwSum[pair]+=bw
+                    self._bwSqSum[pair]+=bw*bw
+                    if bw>self._bwMax[pair]:
+                        self._bwMax[pair]=bw
+            lastTotalBitsSent[:]=self.totalBitsSent
+            self.timeSamples.append(self.env.now)
+
+    def _pairBw(self, pair):
 
-                    bw_interval = (self.totalBitsSent[ip][op] - lastTotalBitsSent[ip][op]) / (self.monitorInterval)
-                    self.bw[ip][op].append(bw_interval)
-                    lastTotalBitsSent[ip][op]=self.totalBitsSent[ip][op]
+        """returns the bandwidth samples of a single (inPort,outPort) pair out of the rows of self.bw"""
 
-            self.timeSamples.append(self.env.now)
+        return self.bw[pair::len(self.totalBitsSent)]
 
     def dumpBwVsTime(self):
 
         #returns two lists: one for the time stamps indicating the closure of monitoring interval
         # (in cycles) and another for the recorded bw during that interval
         name=''
-        time= [name]+[t/simTicksPerCycle for t in self.timeSamples]
+        time= [name,*map(truediv,self.timeSamples,repeat(simTicksPerCycle))]
         data=[]
 
-        for ip in range(len(self.totalBitsSent)):
-            for op in range(len(self.totalBitsSent[ip])):
-                adjustedBw=[simTicksPerCycle*b for b in self.bw[ip][op]]
-                if any(adjustedBw):
-                    data.append(['{}/{}'.format(ip,op)]+adjustedBw)
+        for pair in range(len(self.totalBitsSent)):
+            if self._bwMax[pair]: #samples are never negative, so only pairs with a nonzero maximum have any to report
+                data.append(['{}/{}'.format(*divmod(pair,self.outPorts)),*map(mul,self._pairBw(pair),repeat(simTicksPerCycle))])
 
         return time, data
 
     def dumpStats(self):
         
-        """returns a list of statistics on the operation: 
+        """returns a list of BwStats tuples, one per (inPort,outPort) pair: 
                 1- """
 
         avData=[]
-        for ip in range(len(self.totalBitsSent)):
-            for op in range(len(self.totalBitsSent[ip])):
-
-                maxbw=simTicksPerCycle*max(self.bw[ip][op]) if self.bw[ip][op]!=[] else 0
-                firstActivity=self.firstActivity[ip][op] if self.firstActivity[ip][op] else 0
-                lastActivity=self.lastActivity[ip][op] if self.lastActivity[ip][op] else 0
-                totalBitsSent=self.totalBitsSent[ip][op]
-
-                activeDuration=(lastActivity-firstActivity) if firstActivity!=None else 0
-                
-                averagebw0=simTicksPerCycle*(totalBitsSent/activeDuration) if activeDuration else 0
-                averagebw1=simTicksPerCycle*(totalBitsSent/self.env.now)
-                averagebw2=simTicksPerCycle*mean(self.bw[ip][op]) if self.bw[ip][op] else 0
-                averagebw3=(simTicksPerCycle)*(self.monitorInterval*sum([b**2 for b in self.bw[ip][op]]))/totalBitsSent if totalBitsSent else 0
+        samples=len(self.timeSamples)
+        for pair in range(len(self.totalBitsSent)):
+
+            maxbw=simTicksPerCycle*self._bwMax[pair]
+            firstActivity=self.firstActivity[pair]
+            if isnan(firstActivity):
+                firstActivity=0
+            lastActivity=self.lastActivity[pair]
+            if isnan(lastActivity):
+                lastActivity=0
+            totalBitsSent=self.totalBitsSent[pair]
+
+            activeDuration=lastActivity-firstActivity
+            
+            averagebw0=simTicksPerCycle*(totalBitsSent/activeDuration) if activeDuration else 0
+            averagebw1=simTicksPerCycle*(totalBitsSent/self.env.now)
+            averagebw2=simTicksPerCycle*(self._bwSum[pair]/samples) if samples else 0
+            averagebw3=(simTicksPerCycle)*(self.monitorInterval*self._bwSqSum[pair])/totalBitsSent if totalBitsSent else 0
 
-                avData.append(['{}/{}'.format(ip,op)]+[round(maxbw,2),round(averagebw0,2),round(averagebw1,2),round(averagebw2,2),round(averagebw3,2),totalBitsSent,int(firstActivity/simTicksPerCycle),int(lastActivity/simTicksPerCycle),int(self.env.now/simTicksPerCycle)])
+            avData.append(BwStats('{}/{}'.format(*divmod(pair,self.outPorts)),round(maxbw,2),round(averagebw0,2),round(averagebw1,2),round(averagebw2,2),round(averagebw3,2),totalBitsSent,int(firstActivity/simTicksPerCycle),int(lastActivity/simTicksPerCycle),int(self.env.now/simTicksPerCycle)))
 
         return avData
 
@@ -365,35 +500,31 @@ class RoundRobinCrossbar(Crossbar):
     
     def postDecisionMsg(self,candidate):
 
-        inPortName=self.toUp[candidate].name if self.inPorts>1 else self.toUp.name
-        outPortName=self.toDn[self.routes[candidate]].name if self.outPorts>1 else self.toDn.name                
-        self.Log("INFO", "RoundRobin Arbitration elected packet {} from {} to proceed towards {}".format(self.routedPktList[candidate].uid, inPortName, outPortName))
+        if self.logger.isEnabledFor(logging.INFO):
+            self.Log("INFO", "RoundRobin Arbitration elected packet {} from {} to proceed towards {}".format(self.routedPktList[candidate].uid, self._inPortNames[candidate], self._outPortNames[self.routes[candidate]]))
 
-    def arbitratePkts(self,pktList,outPort=0):
+    def arbitratePkts(self,activeMask,outPort=0):
 
 
-        activeports=[i for i, pkt in enumerate(pktList) if pkt != None]
-        # self.Log("DEBUG", "Ports {} are unmasked for outPort {}".format(activeports,outPort))
+        # self.Log("DEBUG", "Ports {} are unmasked for outPort {}".format(_maskPorts(activeMask),outPort))
 
-        count=0
-        candidate=(self.lastport[outPort]+1)%self.inPorts
+        # rotate the mask so that the port after lastport sits at bit 0, the lowest set bit is then the winner
+        inPorts=self.inPorts
+        base=(self.lastport[outPort]+1)%inPorts
+        rotated=((activeMask>>base)|(activeMask<<(inPorts-base)))&((1<<inPorts)-1)
 
-        while count<self.inPorts:
+        if not rotated:
+            return None
 
-            if pktList[candidate]:
-                self.lastport[outPort]=candidate   
-                inPortName=self.toUp[candidate].name if self.inPorts>1 else self.toUp.name
-                outPortName=self.toDn[outPort].name if self.outPorts>1 else self.toDn.name
+        candidate=(base+(rotated&-rotated).bit_length()-1)%inPorts
+        self.lastport[outPort]=candidate
 
-                unMaskedPorts=[self.toUp[port].name for port in activeports] if self.inPorts>1 else [self.toUp.name]
-                self.Log("INFO", "RoundRobin arbitration between unmasked ports {} elected packet {} from {} to proceed towards {}".format(unMaskedPorts,pktList[candidate].uid, inPortName, outPortName))
-                return candidate
-
-            else:
-                count+=1
-                candidate=(candidate+1)%self.inPorts
-
-        return None
+        if self.logger.isEnabledFor(logging.INFO):
+            inPortName=self._inPortNames[candidate]
+            outPortName=self._outPortNames[outPort]
+            unMaskedPorts=[self._inPortNames[port] for port in _maskPorts(activeMask)]
+            self.Log("INFO", "RoundRobin arbitration between unmasked ports {} elected packet {} from {} to proceed towards {}".format(unMaskedPorts,self.routedPktList[candidate].uid, inPortName, outPortName))
+        return candidate
 
 class WeightedRoundRobinCrossbar(Crossbar):
 
@@ -407,42 +538,19 @@ class WeightedRoundRobinCrossbar(Crossbar):
         
         self.grants=[0]*self.inPorts
 
-    def arbitratePkts(self,pktList,outPort=0):
-
-        activeports=[i for i, pkt in enumerate(pktList) if pkt != None]
-
-        count=0
-
-        candidate=self.lastport[outPort]
-        decisionMade=False
-        selectedCandidate=None
-
-        while count<self.inPorts and not decisionMade:
-
-            if pktList[candidate]:
-
-                if self.weights[candidate]>self.grants[candidate]:
-
-                    selectedCandidate=candidate
-                    decisionMade=True
-
-                elif selectedCandidate==None:
-                    selectedCandidate=candidate
+    def arbitratePkts(self,activeMask,outPort=0):
 
-                if self.grants[candidate]==self.weights[candidate]:
-                    self.grants[candidate]=0
-
-            count=(count+1)
-            candidate=(candidate+1)%self.inPorts
+        selectedCandidate=_wrrArbitrate(activeMask,self.weights,self.grants,self.lastport[outPort])
 
         if selectedCandidate!=None:
 
             self.lastport[outPort]=selectedCandidate
             self.grants[selectedCandidate]+=1
-            inPortName=str((self.toUp[selectedCandidate].name if self.inPorts>1 else self.toUp.name))
-            outPortName=str((self.toDn[outPort].name if self.outPorts>1 else self.toDn.name))
-            unMaskedPorts=[self.toUp[port].name for port in activeports] if self.inPorts>1 else [self.toUp.name]
-            self.Log("INFO", "Weighted RoundRobin arbitration elected packet {} from {} to proceed towards {}".format(pktList[selectedCandidate].uid, inPortName, outPortName))
+
+            if self.logger.isEnabledFor(logging.INFO):
+                inPortName=self._inPortNames[selectedCandidate]
+                outPortName=self._outPortNames[outPort]
+                self.Log("INFO", "Weighted RoundRobin arbitration elected packet {} from {} to proceed towards {}".format(self.routedPktList[selectedCandidate].uid, inPortName, outPortName))
 
             return selectedCandidate
 
@@ -468,45 +576,33 @@ class FixedPriorityCrossbar(Crossbar):
             self.Log("FATAL_ERROR","the number of priorities provided must be equal to the number of inPorts")
         
         self.lastportPerClass=[]
+        self._classMasks=[] #per priority class, bitmask of the inPorts belonging to it
 
         for priorityClass in range(self.priorityClasses):
             self.lastportPerClass.append([-1]*self.outPorts)
+            self._classMasks.append(sum(1<<port for port in range(self.inPorts) if self.priorities[port]==priorityClass))
     
     def postDecisionMsg(self,candidate):
 
-        inPortName=self.toUp[selectedCandidatedate].name if self.inPorts>1 else self.toUp.name
-        outPortName=self.toDn[self.routes[candidate]].name if self.outPorts>1 else self.toDn.name                
-        self.Log("INFO", "FixedPriority Arbitration elected packet {} from {} to proceed towards {}".format(self.routedPktList[candidate].uid, inPortName, outPortName))
-
-    def arbitratePkts(self,pktList,outPort=0):
-
-        activeports=[i for i, pkt in enumerate(pktList) if pkt != None]
-
-        self.Log("DEBUG", "Ports {} are unmasked for outPort {}".format(activeports,outPort))
-        maxpriority=max([self.priorities[port] for port in activeports])
+        if self.logger.isEnabledFor(logging.INFO):
+            self.Log("INFO", "FixedPriority Arbitration elected packet {} from {} to proceed towards {}".format(self.routedPktList[candidate].uid, self._inPortNames[candidate], self._outPortNames[self.routes[candidate]]))
 
-        for port in activeports:
-            if self.priorities[port]<maxpriority:
-                pktList[port]=None
+    def arbitratePkts(self,activeMask,outPort=0):
 
-        count=0
-        candidate=(self.lastportPerClass[maxpriority][outPort]+1)%self.inPorts
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.Log("DEBUG", "Ports {} are unmasked for outPort {}".format(_maskPorts(activeMask),outPort))
 
-        while count<self.inPorts:
+        candidate,maxpriority=_fixedPriorityArbitrate(activeMask,self._classMasks,self.lastportPerClass,outPort,self.inPorts)
 
-            if pktList[candidate]:
-                self.lastportPerClass[maxpriority][outPort]=candidate   
-                self.lastport[outPort]=candidate 
-                inPortName=self.toUp[candidate].name if self.inPorts>1 else self.toUp.name
-                outPortName=self.toDn[outPort].name if self.outPorts>1 else self.toDn.name
-                unMaskedPorts=[self.toUp[port].name for port in activeports] if self.inPorts>1 else [self.toUp.name]
+        if candidate!=None:
+            self.lastportPerClass[maxpriority][outPort]=candidate   
+            self.lastport[outPort]=candidate 
 
-                self.Log("INFO", "Fixed Priority arbitration between unmasked ports {} elected packet {} from {} to proceed towards {}".format(unMaskedPorts,pktList[candidate].uid, inPortName, outPortName))
-                return candidate
-
-            else:
-                count+=1
-                candidate=(candidate+1)%self.inPorts
+            if self.logger.isEnabledFor(logging.INFO):
+                inPortName=self._inPortNames[candidate]
+                outPortName=self._outPortNames[outPort]
+                unMaskedPorts=[self._inPortNames[port] for port in _maskPorts(activeMask)]
+                self.Log("INFO", "Fixed Priority arbitration between unmasked ports {} elected packet {} from {} to proceed towards {}".format(unMaskedPorts,self.routedPktList[candidate].uid, inPortName, outPortName))
 
-        return None
+        return candidate
 
@@ -1,4 +1,6 @@
 import random
+import logging
+from collections import deque
 from Components.BasicComponent import Unit
 from Components.Packets import BasePacket
 from SimSettings import simTicksPerCycle
@@ -11,7 +13,7 @@ class Trafficator(Unit):
     def __init__(self,env,name,parent=None):
         Unit.__init__(self,env,name,parent)
         self.fromDn=self
-        self.pktList=[]
+        self.pktList=deque()
         self.sendDone=Event(self.env)
 
     def run(self):
@@ -26,7 +28,7 @@ class Trafficator(Unit):
 
         while self.pktList:
 
-            yield self.toDn.put(self.pktList.pop(0))
+            yield self.toDn.put(self.pktList.popleft())
 
         self.sendDone.succeed()
 
@@ -57,20 +59,31 @@ class TrafficSink(Unit):
 
         self.Log("DEBUG","Expecting {} bytes".format(self.expectedBytes))
 
+        upstream=self.toUp
+        timeout=self.env.timeout
+        bytesPerTick=self.bytesPerTick
+
         while self.receivedBytes!=self.expectedBytes:
-            pkt= yield self.toUp.get()
-            self.Log("DEBUG","Extracted packet {} from {}".format(pkt.uid,self.toUp.name))
+            pkt= yield upstream.get()
+            debug=self.logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                self.Log("DEBUG","Extracted packet {} from {}".format(pkt.uid,upstream.name))
             self.updateReceivedBytes(pkt)
             self.totalBitsSent+=pkt.getBytes()*8
-            yield self.env.timeout(pkt.getTicks(self.bytesPerTick)*simTicksPerCycle)
-            self.Log("DEBUG","Received {} out of {} expected bytes".format(self.receivedBytes,self.expectedBytes))
+            ticks,debt=pkt.getTicks(bytesPerTick)
+            yield timeout(ticks*simTicksPerCycle)
+            if debug:
+                self.Log("DEBUG","Received {} out of {} expected bytes".format(self.receivedBytes,self.expectedBytes))
 
         self.receiveDone.succeed()
 
         self.Log('INFO',"Completed Receiving {} bytes out of expected {} bytes ({} out of {} pkts)".format(self.receivedBytes,self.expectedBytes,self.receivedPkts,self.expectedPkts))
-        while True:
-            pkt=yield self.toUp.get()
-            self.Log('FATAL_ERROR',"Received unexpected packet {} after being done.".format(pkt.uid))
+        # no process is kept alive to catch extra traffic, a chain of get callbacks reports every extra packet instead
+        upstream.get().callbacks.append(self._onUnexpectedPacket)
+
+    def _onUnexpectedPacket(self,getEvent):
+        self.Log('FATAL_ERROR',"Received unexpected packet {} after being done.".format(getEvent.value.uid))
+        self.toUp.get().callbacks.append(self._onUnexpectedPacket)
 
     def updateReceivedBytes(self,pkt):
         self.receivedPkts+=1
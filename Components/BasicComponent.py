@@ -3,6 +3,30 @@
     with the helper tools to connect components and units"""
 
 import logging
+import sys
+from collections import deque, namedtuple
+from functools import partial
+import SimSettings
+
+# logging level of each supported Log() message type
+_LEVEL = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING, 'FATAL_ERROR': logging.ERROR}
+
+# row returned by the dumpStats() of the bandwidth monitored components: name prefix, bandwidths in Gbps and times in cycles
+BwStats = namedtuple('BwStats', 'name maxbw averagebw0 averagebw1 averagebw2 averagebw3 totalBitsSent firstActivity lastActivity simTime')
+
+# loggers already handed out by logging.getLogger(), keyed by the interned component fullname
+_LOGGER_CACHE = {}
+
+def _setPort(unit, attr, key, value):
+    """Sets the port attribute attr of unit to value, or its entry key if the port is a dictionary of ports (key not None)"""
+    if key is None:
+        setattr(unit, attr, value)
+    else:
+        getattr(unit, attr)[key] = value
+
+def _portStr(key):
+    """Port index suffix used in the connection DEBUG messages, empty for single ports"""
+    return '' if key is None else '[%s]' % key
 
 class ComponentBase(object):
 
@@ -14,77 +38,99 @@ class ComponentBase(object):
            * parent (object) : points to the parent component/unit if this is a sub-component, None if not
            * fullname (string): point separated hierarchy of the component (family tree)
            * action (simpy.Event): variable storing a reference to the action taken by the component
-                when simulation starts
+                when simulation starts, None if the component does not customize run()
            * logger: instane of the logging.getLogger() to make is simple to add logs for debug
         
         Methods:
            * __init__() : initialize the component using environment,name and parent
-           * run()      : the code that runs when simulation begins, customizable, by default it does nothing and is done
-                        after 1 tick. This will be customized for the purpose of the system being simulated
+           * run()      : the code that runs when simulation begins, customizable, by default it does nothing and no
+                        process is started for it. This will be customized for the purpose of the system being simulated
            * Log()      : helper function that allows simple logging by setting message type and the message
            * setLogLevel(l): sets the log level existing in the python logging package to control how much info
                              the user wants in the log files (eg INFO, DEBUG, ERROR)
     """
 
+    # the port slots belong to Component, they are declared here so that every component shares one attribute layout
+    __slots__ = ('env', 'name', 'parent', 'fullname', 'action', 'logger', '_dbg', '_inf', 'toUp', 'toDn', 'fromUp', 'fromDn')
+
+    _HAS_RUN = False #whether the class customizes run(), set for every subclass by __init_subclass__
+    _HAS_PORTS = False #whether instances get the toUp/toDn/fromUp/fromDn port dictionaries, see Component
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._HAS_RUN = cls.run is not ComponentBase.run
 
     def __init__(self, env, name, parent=None):
 
         self.env = env
         self.name = name
         self.parent=parent
-        self.fullname = (parent.fullname + "."  if parent!=None else "") + name
-        self.action = self.env.process(self.run())
-        self.logger = logging.getLogger(self.fullname)
+        self.fullname = sys.intern("%s.%s" % (parent.fullname, name) if parent is not None else name)
+        if self._HAS_PORTS:
+            self.toUp={}
+            self.toDn={}
+            self.fromUp={}
+            self.fromDn={}
+        # structural components/units that keep the dummy run() are not given a simpy process at all
+        self.action = self.env.process(self.run()) if self._HAS_RUN else None
+        logger = _LOGGER_CACHE.get(self.fullname)
+        if logger is None:
+            logger = _LOGGER_CACHE[self.fullname] = logging.getLogger(self.fullname)
+        self.logger = logger
+        self._refresh_levels()
 
     def run(self):
 
         """Dummy simpy run function for the base class; completes after one time simpy tick"""
         yield self.env.timeout(1)
 
-    def Log(self, msgtype, msg, pkt=None, infolist=None):
+    def Log(self, msgtype, msg, *args, pkt=None, infolist=None):
 
         """Common logging function used by all components/units classes
 
         Arguments:
            msgtype(string) : One of 'FATAL_ERROR', 'WARNING', INFO', 'DEBUG'
            msg(string)     : The message to be logged, specified by the component
+           args            : Optional %-style arguments of msg, only interpolated if the message is emitted
            pkt(ElPktHdr)   : Packet related messages may pass the packet concerned in order to enable
                              packet info message filtering
            infolist(list)  : Some messages may pass this list of strings as arbitrary additional debug
                              info to be logged"""
 
-        # construct the output from the current sim time, objects full pathname and the passed message
-        fullmsg = '[@%d]%s : %s' % (self.env.now, self.fullname, msg)
-        displayinfo = True
+        level = _LEVEL.get(msgtype)
+        if level is None:
+            raise RuntimeError("ERROR: Unsupported message type [%s] in %s " % (msgtype, self.fullname))
 
+        # return before doing any work if the logger would discard the message anyway
+        log = self.logger
+        if level < logging.ERROR and not log.isEnabledFor(level):
+            return
 
-        # always output the message if it is an error message or warning
-        if msgtype == 'FATAL_ERROR':
-            self.logger.error(fullmsg)
-        elif msgtype == 'WARNING':
-            self.logger.warning(fullmsg)
-        elif msgtype == 'INFO':
-            # info messages can be suppressed according to packet id
-            if displayinfo:
-                self.logger.info(fullmsg)
-        elif msgtype == 'DEBUG':
-            self.logger.debug(fullmsg)
-        else:
-            raise RuntimeError("ERROR: Unsupported message type [%s] in %s " % (msgtype, self.fullname))
+        # the output is built from the current sim time, objects full pathname and the passed message. The
+        # arguments are handed to the logger unformatted so that filtered messages are never interpolated
+        displayinfo = True
+
+        # info messages can be suppressed according to packet id
+        if level != logging.INFO or displayinfo:
+            if args:
+                log.log(level, '[@%d]%s : ' + msg, self.env.now, self.fullname, *args)
+            else:
+                log.log(level, '[@%d]%s : %s', self.env.now, self.fullname, msg)
 
         # some messages pass a list of strings which provides more debug info relating to the message
         # if this argument is present, print out the strings (unless message is being suppressed)
-        if infolist and displayinfo:
-            self.logger.info("\tInfodump follows:")
-            for item in infolist:
-                self.logger.info("\t%s" % item)
-
-        # finally, if the message was an error, raise an exception.
-        if 'ERRROR' in msgtype:
-            raise RuntimeError(fullmsg)
+        if infolist and displayinfo and log.isEnabledFor(logging.INFO):
+            log.info("\tInfodump follows:\n\t%s", "\n\t".join(map(str, infolist)))
 
     def setLogLevel(self,level):
         self.logger.setLevel(level)
+        self._refresh_levels()
+
+    def _refresh_levels(self):
+        """Caches whether DEBUG/INFO messages are enabled, letting hot call sites skip Log() without a call: if self._dbg: self.Log('DEBUG',...).
+        The flags follow setLogLevel(); levels changed directly through the logging package are only seen by Log() itself"""
+        self._dbg = self.logger.isEnabledFor(logging.DEBUG)
+        self._inf = self.logger.isEnabledFor(logging.INFO)
 
 class Component(ComponentBase):
 
@@ -99,13 +145,9 @@ class Component(ComponentBase):
 
             """
 
-    def __init__(self,env,name,parent=None):
-    
-        ComponentBase.__init__(self,env,name,parent)
-        self.toUp={}
-        self.toDn={}
-        self.fromUp={}
-        self.fromDn={}
+    __slots__ = ()
+
+    _HAS_PORTS = True #the port dictionaries are created by ComponentBase.__init__
 
 class Unit(Component):
 
@@ -115,7 +157,7 @@ class Unit(Component):
 
         Arguments:
             * unitDict : a dictionary of all the sub-components and sub-units that form the current unit
-            * connList : a list of all the different connections between the different components
+            * connList : a list of all the different connections between the different components, see _scheduleConn()
 
         Methods:
             * init(): initialize an empty component with the empty variables
@@ -123,9 +165,12 @@ class Unit(Component):
             * connect : main method for connecting the different sub-components and sub-units inside the main unit
                         as well as exposing the main unit interface to outside units (through the toUp, toDn, fromUp, fromDn dictionaries)
                         it takes as argument the source and destination units(components) as well as the src/dest ports (if any)
-            * unitConns(): when there are sub-units inside the main unit, this is a recursive method for completing the connection
+            * unitConns(): when there are sub-units inside the main unit, this is the method that walks them all for completing the connection
                             defined by the connect method
         """
+
+    __slots__ = ('unitDict', 'connList')
+
     def __init__(self,env,name,parent=None):
 
         Component.__init__(self,env,name,parent)
@@ -147,113 +192,123 @@ class Unit(Component):
            fromPort(dictKey)   : Key into the fromUnit's downstream port dictionaries, can be a string or int. Optional argument in the case that the fromUnit has only a single downstream port
            toPort(dictKey)     : Key into the toUnit's upstream port dictionaries, can be a string or int. Optional argument in the case that the toUnit has only a single upstream port"""
 
-        # construct the output from the current sim time, objects full pathname and the passed message
+        # the DEBUG messages are only built when they are going to be logged
+        debug = self.logger.isEnabledFor(logging.DEBUG)
         if toUnit is self:
-            self.Log("DEBUG", "connect(): connecting fromUnit: %s to self: %s" % (fromUnit.fullname, self.fullname))
+            if debug:
+                self.Log("DEBUG", "connect(): connecting fromUnit: %s to self: %s" % (fromUnit.fullname, self.fullname))
             if fromPort is not None and toPort is not None:
                 self.fromDn[fromPort] = fromUnit.fromDn[toPort]
-                self.connList.append([[self, 'toDn', toPort], [fromUnit, 'toDn', toPort]])
-                self.Log("DEBUG", "  --  connecting               fromUnit: %s.fromDn to self: %s.fromDn, %s.fromDn[%s] is now %s" % (fromUnit.fullname, self.fullname, str(fromPort), self.fullname, self.fromDn[fromPort]))
-                self.Log("DEBUG", "  --  scheduling connection of fromUnit: %s.toDn[%s] to self: %s.toDn[%s]" % (fromUnit.fullname, str(fromPort), self.fullname, str(toPort)))
+                self._scheduleConn([self, 'toDn', toPort], [fromUnit, 'toDn', toPort])
+                if debug:
+                    self.Log("DEBUG", "  --  connecting               fromUnit: %s.fromDn to self: %s.fromDn, %s.fromDn[%s] is now %s" % (fromUnit.fullname, self.fullname, str(fromPort), self.fullname, self.fromDn[fromPort]))
+                    self.Log("DEBUG", "  --  scheduling connection of fromUnit: %s.toDn[%s] to self: %s.toDn[%s]" % (fromUnit.fullname, str(fromPort), self.fullname, str(toPort)))
             elif fromPort is not None:
                 self.fromDn[fromPort] = fromUnit.fromDn
-                self.connList.append([[self, 'toDn'],         [fromUnit, 'toDn', fromPort]])
-                self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn to self: %s.fromDn, %s.fromDn[%s] is now %s" % (fromUnit.fullname, self.fullname, str(fromPort), self.fullname, self.fromDn[fromPort]))
-                self.Log("DEBUG", "  --  scheduling connection of fromUnit: %s.toDn[%s] to self: %s.toDn" % (fromUnit.fullname, str(fromPort), self.fullname))
+                self._scheduleConn([self, 'toDn'], [fromUnit, 'toDn', fromPort])
+                if debug:
+                    self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn to self: %s.fromDn, %s.fromDn[%s] is now %s" % (fromUnit.fullname, self.fullname, str(fromPort), self.fullname, self.fromDn[fromPort]))
+                    self.Log("DEBUG", "  --  scheduling connection of fromUnit: %s.toDn[%s] to self: %s.toDn" % (fromUnit.fullname, str(fromPort), self.fullname))
             elif toPort is not None:
                 self.fromDn[toPort]=fromUnit.fromDn
                 self.toDn[toPort]=None
-                self.connList.append([[self, 'toDn', toPort], [fromUnit, 'toDn']])
-                self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn to self: %s.fromDn, %s.fromDn is now %s" % (fromUnit, self.fullname, self.fullname, self.fromDn))
-                self.Log("DEBUG", "  --  scheduling connection of fromUnit: %s.toDn to self: %s.toDn[%s]" % (fromUnit.fullname, self.fullname, str(toPort)))
+                self._scheduleConn([self, 'toDn', toPort], [fromUnit, 'toDn'])
+                if debug:
+                    self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn to self: %s.fromDn, %s.fromDn is now %s" % (fromUnit, self.fullname, self.fullname, self.fromDn))
+                    self.Log("DEBUG", "  --  scheduling connection of fromUnit: %s.toDn to self: %s.toDn[%s]" % (fromUnit.fullname, self.fullname, str(toPort)))
             else:
                 self.fromDn = fromUnit.fromDn
-                self.connList.append([[self, 'toDn'],         [fromUnit, 'toDn']])
-                self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn to self: %s.fromDn, %s.fromDn is now %s" % (fromUnit, self.fullname, self.fullname, self.fromDn))
-                self.Log("DEBUG", "  --  scheduling connection of fromUnit: %s.toDn to self: %s.toDn" % (fromUnit.fullname, self.fullname))
+                self._scheduleConn([self, 'toDn'], [fromUnit, 'toDn'])
+                if debug:
+                    self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn to self: %s.fromDn, %s.fromDn is now %s" % (fromUnit, self.fullname, self.fullname, self.fromDn))
+                    self.Log("DEBUG", "  --  scheduling connection of fromUnit: %s.toDn to self: %s.toDn" % (fromUnit.fullname, self.fullname))
         elif fromUnit is self:
-            self.Log("DEBUG", "connect(): connecting self: %s to toUnit: %s" % (self.fullname, toUnit.fullname))
+            if debug:
+                self.Log("DEBUG", "connect(): connecting self: %s to toUnit: %s" % (self.fullname, toUnit.fullname))
             if fromPort is not None and toPort is not None:
                 self.fromUp[fromPort] = toUnit.fromUp[toPort]
-                self.connList.append([[self, 'toUp', fromPort], [toUnit, 'toUp', toPort]])  
-                self.Log("DEBUG", "  --  connecting               self: %s.fromUp[%s] to toUnit: %s.fromUp[%s], %s.fromUp[%s] is now %s" % (self.fullname, str(fromPort), toUnit.fullname, str(toPort), str(fromPort), self.fullname, self.fromUp[fromPort]))
-                self.Log("DEBUG", "  --  scheduling connection of self: %s.toUp[%s] to toUnit: %s.toUp[%s]" % (self.fullname, str(fromPort), toUnit.fullname, str(toPort)))
+                self._scheduleConn([self, 'toUp', fromPort], [toUnit, 'toUp', toPort])
+                if debug:
+                    self.Log("DEBUG", "  --  connecting               self: %s.fromUp[%s] to toUnit: %s.fromUp[%s], %s.fromUp[%s] is now %s" % (self.fullname, str(fromPort), toUnit.fullname, str(toPort), str(fromPort), self.fullname, self.fromUp[fromPort]))
+                    self.Log("DEBUG", "  --  scheduling connection of self: %s.toUp[%s] to toUnit: %s.toUp[%s]" % (self.fullname, str(fromPort), toUnit.fullname, str(toPort)))
             elif fromPort is not None:
                 self.fromUp[fromPort] = toUnit.fromUp
                 self.toUp[fromPort]=None
-                self.connList.append([[self, 'toUp', fromPort], [toUnit, 'toUp']])
-                self.Log("DEBUG", "  --  connecting               self: %s.fromUp[%s] to toUnit: %s.fromUp, %s.fromUp[%s] is now %s" % (self.fullname, str(fromPort), toUnit.fullname, str(fromPort), self.fullname, self.fromUp[fromPort]))
-                self.Log("DEBUG", "  --  scheduling connection of self: %s.toUp[%s] to toUnit: %s.toUp" % (self.fullname, str(fromPort), toUnit.fullname))
+                self._scheduleConn([self, 'toUp', fromPort], [toUnit, 'toUp'])
+                if debug:
+                    self.Log("DEBUG", "  --  connecting               self: %s.fromUp[%s] to toUnit: %s.fromUp, %s.fromUp[%s] is now %s" % (self.fullname, str(fromPort), toUnit.fullname, str(fromPort), self.fullname, self.fromUp[fromPort]))
+                    self.Log("DEBUG", "  --  scheduling connection of self: %s.toUp[%s] to toUnit: %s.toUp" % (self.fullname, str(fromPort), toUnit.fullname))
             elif toPort is not None:
                 self.fromUp = toUnit.fromUp[toPort]
-                self.connList.append([[self, 'toUp'],           [toUnit, 'toUp', toPort]])
-                self.Log("DEBUG", "  --  connecting               self: %s.fromUp to toUnit: %s.fromUp[%s], %s.fromUp is now %s" % (self.fullname, toUnit.fullname, str(toPort), self.fullname, self.fromUp))
-                self.Log("DEBUG", "  --  scheduling connection of self: %s.toUp to toUnit: %s.toUp[%s]" % (self.fullname, toUnit.fullname, str(toPort)))
+                self._scheduleConn([self, 'toUp'], [toUnit, 'toUp', toPort])
+                if debug:
+                    self.Log("DEBUG", "  --  connecting               self: %s.fromUp to toUnit: %s.fromUp[%s], %s.fromUp is now %s" % (self.fullname, toUnit.fullname, str(toPort), self.fullname, self.fromUp))
+                    self.Log("DEBUG", "  --  scheduling connection of self: %s.toUp to toUnit: %s.toUp[%s]" % (self.fullname, toUnit.fullname, str(toPort)))
             else:
                 self.fromUp = toUnit.fromUp
-                self.connList.append([[self, 'toUp'],           [toUnit, 'toUp']])
-                self.Log("DEBUG", "  --  connecting               self: %s.fromUp to toUnit: %s.fromUp, %s.fromUp is now %s" % (self.fullname, toUnit.fullname, self.fullname, self.fromUp))
-                self.Log("DEBUG", "  --  scheduling connection of self: %s.toUp to toUnit: %s.toUp" % (self.fullname, toUnit.fullname))
+                self._scheduleConn([self, 'toUp'], [toUnit, 'toUp'])
+                if debug:
+                    self.Log("DEBUG", "  --  connecting               self: %s.fromUp to toUnit: %s.fromUp, %s.fromUp is now %s" % (self.fullname, toUnit.fullname, self.fullname, self.fromUp))
+                    self.Log("DEBUG", "  --  scheduling connection of self: %s.toUp to toUnit: %s.toUp" % (self.fullname, toUnit.fullname))
         else:
+            if debug:
+                self.Log("DEBUG", "connect(): fromUnit: %s, toUnit: %s" % (fromUnit.fullname, toUnit.fullname))
 
-            self.Log("DEBUG", "connect(): fromUnit: %s, toUnit: %s" % (fromUnit.fullname, toUnit.fullname))
-
-            if fromPort is not None and toPort is not None:
-
-                fromUnit.toDn[fromPort] = toUnit.fromUp[toPort]
-                self.Log("DEBUG", "  --  connecting toUnit: %s.fromUp[%s] to fromUnit: %s.toDn[%s], %s.toDn[%s] is now %s" % (toUnit.fullname, str(toPort), fromUnit.fullname, str(fromPort), fromUnit.fullname, str(fromPort), fromUnit.toDn[fromPort].fullname))
-
-            elif fromPort is not None:
-                fromUnit.toDn[fromPort] = toUnit.fromUp
-                self.Log("DEBUG", "  --  connecting toUnit: %s.fromUp to fromUnit: %s.toDn[%s], %s.toDn[%s] is now %s" % (toUnit.fullname, fromUnit.fullname, str(fromPort), fromUnit.fullname, str(fromPort), fromUnit.toDn[fromPort].fullname))
-
-            elif toPort is not None:
-                fromUnit.toDn           = toUnit.fromUp[toPort]
-                self.Log("DEBUG", "  --  connecting toUnit: %s.fromUp[%s] to fromUnit: %s.toDn, %s.toDn is now %s" % (toUnit.fullname, str(toPort), fromUnit.fullname, fromUnit.fullname, fromUnit.toDn.fullname))
-
-            else:
-                fromUnit.toDn           = toUnit.fromUp
-                self.Log("DEBUG", "  --  connecting toUnit: %s.fromUp to fromUnit: %s.toDn, %s.toDn is now %s" % (toUnit.fullname, fromUnit.fullname, fromUnit.fullname, fromUnit.toDn.fullname))
+            # up->down connection
+            upPort = toUnit.fromUp if toPort is None else toUnit.fromUp[toPort]
+            _setPort(fromUnit, 'toDn', fromPort, upPort)
+            if debug:
+                self.Log("DEBUG", "  --  connecting toUnit: %s.fromUp%s to fromUnit: %s.toDn%s, %s.toDn%s is now %s" % (toUnit.fullname, _portStr(toPort), fromUnit.fullname, _portStr(fromPort), fromUnit.fullname, _portStr(fromPort), upPort.fullname))
 
             # down->up connection
+            dnPort = fromUnit.fromDn if fromPort is None else fromUnit.fromDn[fromPort]
+            _setPort(toUnit, 'toUp', toPort, dnPort)
+            if debug:
+                self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn%s to toUnit: %s.toUp%s, %s.toUp%s is now %s" % (fromUnit.fullname, _portStr(fromPort), toUnit.fullname, _portStr(toPort), toUnit.fullname, _portStr(toPort), dnPort.fullname))
 
-            if fromPort is not None and toPort is not None:
-                toUnit.toUp[toPort] = fromUnit.fromDn[fromPort]
-                self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn[%s] to toUnit: %s.toUp[%s], %s.toUp[%s] is now %s" % (fromUnit.fullname, str(fromPort), toUnit.fullname, str(toPort), toUnit.fullname, str(toPort), toUnit.toUp[toPort].fullname))
-
-            elif fromPort is not None:
-                toUnit.toUp         = fromUnit.fromDn[fromPort]
-                self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn[%s] to toUnit: %s.toUp, %s.toUp is now %s" % (fromUnit.fullname, str(fromPort), toUnit.fullname, toUnit.fullname, toUnit.toUp.fullname))
-
-            elif toPort is not None:
-                toUnit.toUp[toPort] = fromUnit.fromDn
-                self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn to toUnit: %s.toUp[%s], %s.toUp[%s] is now %s" % (fromUnit.fullname, toUnit.fullname, str(toPort), toUnit.fullname, str(toPort), toUnit.toUp[toPort].fullname))
+    def _scheduleConn(self, fromList, toList):
+        """Appends a connection to connList for unitConns() to complete. Both ends are [unit, attrname] or [unit, attrname, key]
+        lists; their shape is resolved here, once, into a getter for the source and a setter for the destination"""
 
-            else:
-                toUnit.toUp         = fromUnit.fromDn
-                self.Log("DEBUG", "  --  connecting fromUnit: %s.fromDn to toUnit: %s.toUp, %s.toUp is now %s" % (fromUnit.fullname, toUnit.fullname, toUnit.fullname, toUnit.toUp.fullname))
+        if len(fromList) > 2:
+            getter = lambda unit=fromList[0], attr=fromList[1], key=fromList[2]: getattr(unit, attr)[key]
+        else:
+            getter = partial(getattr, fromList[0], fromList[1])
+        if len(toList) > 2:
+            setter = lambda value, unit=toList[0], attr=toList[1], key=toList[2]: getattr(unit, attr).__setitem__(key, value)
+        else:
+            setter = partial(setattr, toList[0], toList[1])
+        self.connList.append((fromList, toList, getter, setter))
 
     def unitConns(self):
 
-        """Recursive method for completing all connections between units and components as defined by the calls to the connect() method 
-        invoked in both the top level unit and all levles of hierarchy below.
+        """Completes all connections between units and components as defined by the calls to the connect() method
+        invoked in both the top level unit and all levles of hierarchy below. The hierarchy is walked with an explicit
+        stack rather than by recursion, visiting units in the same (depth first) order.
 
         Arguments: None"""
 
-        for unit in self.unitDict.values():
-            for fromList,toList in unit.connList:
-                if len(fromList) > 2:
-                    fr = vars(fromList[0])[fromList[1]][fromList[2]]
-                    frStr = fromList[0].fullname+'.'+fromList[1]+'['+str(fromList[2])+']'
-                else:
-                    fr = vars(fromList[0])[fromList[1]]
-                    frStr = fromList[0].fullname+'.'+fromList[1]
-                if len(toList) > 2:
-                    vars(toList[0])[toList[1]][toList[2]] = fr
-                    toStr = toList[0].fullname+'.'+toList[1]+'['+str(toList[2])+']'
-                else:
-                    vars(toList[0])[toList[1]] = fr
-                    toStr = toList[0].fullname+'.'+toList[1]
-                self.Log("DEBUG", "unitConns() connecting %s to %s" % (frStr, toStr))
-            unit.unitConns()
-
+        # each entry is a unit whose connections are to be completed along with its parent, whose logger reports them
+        stack = deque((self, unit) for unit in reversed(list(self.unitDict.values())))
+        while stack:
+            parent, unit = stack.pop()
+            debug = parent.logger.isEnabledFor(logging.DEBUG)
+            for fromList,toList,getter,setter in unit.connList:
+                setter(getter())
+                if debug:
+                    frStr = fromList[0].fullname+'.'+fromList[1]+('['+str(fromList[2])+']' if len(fromList) > 2 else '')
+                    toStr = toList[0].fullname+'.'+toList[1]+('['+str(toList[2])+']' if len(toList) > 2 else '')
+                    parent.Log("DEBUG", "unitConns() connecting %s to %s" % (frStr, toStr))
+            stack.extend((unit, child) for child in reversed(list(unit.unitDict.values())))
+
+# the complete ComponentBase.Log, kept for _logWarningsOnly to forward warnings and errors to
+_fullLog = ComponentBase.Log
+
+def _logWarningsOnly(self, msgtype, msg, *args, pkt=None, infolist=None):
+    """Replaces ComponentBase.Log when SimSettings.logEnabled is False: DEBUG and INFO messages return without any level check"""
+    if msgtype == 'DEBUG' or msgtype == 'INFO':
+        return
+    _fullLog(self, msgtype, msg, *args, pkt=pkt, infolist=infolist)
+
+if not SimSettings.logEnabled:
+    ComponentBase.Log = _logWarningsOnly
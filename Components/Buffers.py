@@ -1,13 +1,101 @@
-from Components.BasicComponent import Component
+from Components.BasicComponent import Component, BwStats
+import logging
 from simpyExtensions.util import NewEvent, BufferPut, BufferGet, BufferPeek
-from simpy.resources.store import Store, StorePut
+from simpy.resources.store import Store
 from SimSettings import simTicksPerCycle
-from statistics import mean
+from collections import deque
+from itertools import repeat
+from operator import mul, truediv
 
 #---------------------------------------------------------------------------------
 #Storage objects: Generic Buffer, FlowControlled Buffer, credit buffer
 #---------------------------------------------------------------------------------
-class Buffer(Component, Store):
+class _PeekableStore(Store):
+    """simpy Store with the peek support shared by Buffer and CreditBuffer: pending BufferPeek events wait in
+    peek_queue. Subclasses implement _do_peek(event), which must only return True once it has triggered the event.
+
+    The put, get and peek queues are deques served strictly from the head, so _do_put/_do_get are held to the same
+    rule as _do_peek. Cancelled events stay in their queue as tombstones and are dropped when they reach the head"""
+
+    PutQueue = deque
+    GetQueue = deque
+
+    def __init__(self, env, capacity):
+
+        Store.__init__(self,env,capacity)
+        self.peek_queue=deque()
+
+    def _trigger_put(self, get_event) -> None:
+        """Trigger put events.
+
+        Same as simpy's BaseResource._trigger_put() except that the scan stops at the first put event left
+        untriggered, so served events are always popped from the head of the :attr:`put_queue` in O(1).
+        """
+
+        put_queue=self.put_queue
+        while put_queue:
+            put_event = put_queue[0]
+            if put_event._cancelled:
+                put_queue.popleft()
+                continue
+            proceed = self._do_put(put_event)
+            if not put_event.triggered:
+                break
+            put_queue.popleft()
+
+            if not proceed:
+                break
+
+        return None
+
+    def _trigger_get(self, put_event) -> None:
+        """Trigger get events, serving the :attr:`get_queue` from its head as _trigger_put() does"""
+
+        get_queue=self.get_queue
+        while get_queue:
+            get_event = get_queue[0]
+            if get_event._cancelled:
+                get_queue.popleft()
+                continue
+            proceed = self._do_get(get_event)
+            if not get_event.triggered:
+                break
+            get_queue.popleft()
+
+            if not proceed:
+                break
+
+        return None
+
+    def _trigger_peek(self,*args) -> None:
+        """Trigger peek events.
+
+        This method is called once a new peek event has been created or a put
+        event has been processed.
+
+        The method serves the peek events in the :attr:`peek_queue` in order,
+        calling :meth:`_do_peek` for each of them. It stops at the first event
+        left untriggered or once :meth:`_do_peek` returns ``False``. Served
+        events are always at the head of the queue, so they are popped in O(1).
+        """
+
+        peek_queue=self.peek_queue
+        while peek_queue:
+            peek_event = peek_queue[0]
+            if peek_event._cancelled:
+                peek_queue.popleft()
+                continue
+            proceed = self._do_peek(peek_event)
+            if not peek_event.triggered:
+                break
+            peek_queue.popleft()
+
+            if not proceed:
+                break
+
+        return None
+
+class Buffer(Component, _PeekableStore):
     """ Generic class for a buffer that can be animated. It inherits from the Component class
 
         Class members:
@@ -21,6 +109,7 @@ class Buffer(Component, Store):
             - putBytesPerCycle: indicates how many bytes can be written into the buffer per tick
             - putBytesPerCycle: indicates how many bytes can be read from the buffer per tick
             - animate: a flag indicating whether the buffer is to be animated
+            - bwHistorySize: how many bandwidth monitoring intervals are kept for dumpBwVsTime() (None keeps all)
             - other members used to gather statistics about the operation of the buffer
 
         Class methods:
@@ -35,6 +124,7 @@ class Buffer(Component, Store):
             - put(pkt): a method for inserting packets into the buffer (see put() code below for more info)
             - get(): a method for retrieving packets from the head of the buffer (see get() code below for more info)
             - peek(): a method that returns the packet at the head of the buffer, if any, without removing it.
+            - peekNow(): returns the packet at the head of the buffer, or None, without creating an event
             - addDelayBeforePut():returns the number of ticks to wait before packet start being inserted into the buffer
             - addDelayAfterPut():returns the number of ticks to wait after packet is inserted into the buffer before another packet can be put
             - addDelayBeforeGet():returns the number of ticks to wait before packet start being read from the buffer
@@ -56,6 +146,7 @@ class Buffer(Component, Store):
                        getDelay=0,
                        monitorBW=False,
                        monitorInterval=250,
+                       bwHistorySize=None,
                        animate=False,
                        canvas=None,
                        an_params=None):
@@ -63,8 +154,9 @@ class Buffer(Component, Store):
 
         Component.__init__(self, env, name, parent)
 
-        Store.__init__(self,env,capacity)
-        self.peek_queue=[]
+        _PeekableStore.__init__(self,env,capacity)
+        self.items=deque() #FIFO of the stored packets, gets pop from the head in O(1)
+        self._insertPool=[] #processed pre-put delay events ready for reuse, see _acquireInsertEvent()
         self.putDelay=putDelay
         self.getDelay=getDelay
         self.putDebt=0
@@ -73,18 +165,24 @@ class Buffer(Component, Store):
         self.getBytesPerCycle=getBytesPerCycle
         self.fromUp = self
         self.fromDn = self
-        self.putCalls=[]
-        self.putTimes=[]
-        self.getCalls=[]
-        self.getTimes=[]
+        self.putCalls=deque()
+        self.putTimes=deque()
+        self.getCalls=deque()
+        self.getTimes=deque()
 
 
-        self.timeSamples=[]
+        # bandwidth samples are kept in ring buffers holding the last bwHistorySize intervals (all of them if None),
+        # dumpStats() reads the running aggregates below so that it still covers the whole simulation
+        self.timeSamples=deque(maxlen=bwHistorySize)
         self.monitorBW=monitorBW
         self.totalWrBits=0
         self.totalRdBits=0
-        self.wrBw=[]
-        self.rdBw=[]
+        self.wrBw=deque(maxlen=bwHistorySize)
+        self.rdBw=deque(maxlen=bwHistorySize)
+        self._wrCount=0 #number of write bandwidth samples taken so far
+        self._wrSum=0 #sum of the write bandwidth samples
+        self._wrSqSum=0 #sum of the squared write bandwidth samples
+        self._wrMax=0 #largest write bandwidth sample
         self.monitorInterval=monitorInterval* simTicksPerCycle
         self.lastActivity=0
         self.firstActivity=None
@@ -95,10 +193,31 @@ class Buffer(Component, Store):
         self.statistics['inter_arrival_time']=0
         self.statistics['inter_departure_time']=0
         self.statistics['staytime']=0
+        self.statistics['inter_arrival_time_ssd']=0
+        self.statistics['inter_departure_time_ssd']=0
+        self.statistics['staytime_ssd']=0
         self.statistics['pktcount']=0
         if self.animate:
             self.slots=self.initUI()
 
+    @property
+    def putDelay(self):
+        return self._putDelay
+
+    @putDelay.setter
+    def putDelay(self,putDelay):
+        self._putDelay=putDelay
+        self._putDelayTicks=putDelay*simTicksPerCycle #scaled once here rather than on every put
+
+    @property
+    def getDelay(self):
+        return self._getDelay
+
+    @getDelay.setter
+    def getDelay(self,getDelay):
+        self._getDelay=getDelay
+        self._getDelayTicks=getDelay*simTicksPerCycle
+
     def run(self):
 
         if self.animate:
@@ -116,49 +235,46 @@ class Buffer(Component, Store):
     def isFull(self):
         """returns True if the buffer is full. usage: buffer.isFull()"""
 
-        if self.occupiedSlots()==self.capacity:
-            return True
-        else:
-            return False
+        return len(self.items)>=self._capacity
 
     def isEmpty(self):
 
         """returns True if the buffer is Empty. usage: buffer.isEmpty()"""
-        if self.occupiedSlots()==0:
-
-            return True
-        else:
-            return False
+        return not self.items
 
     def availableSlots(self):
 
-        return (self.capacity-self.occupiedSlots())
+        return self._capacity-len(self.items)
 
     def occMonitor(self):
 
+        """pairs completed put and get calls in FIFO order and folds their stay time, inter-arrival time and
+        inter-departure time into the statistics dictionary. The means and the sums of squared deviations
+        (<key>_ssd, variance=ssd/pktcount) are updated online with Welford's algorithm, so each packet costs O(1)"""
+
+        stats=self.statistics
         last_arrival=0
         last_departure=0
         while True:
 
             while self.putCalls and self.getCalls and \
                   self.putCalls[0].processed and  self.getCalls[0].processed:
-                put=self.putCalls.pop()
-                get=self.getCalls.pop()
-                putTime=self.putTimes.pop()
-                getTime=self.getTimes.pop()
-
-                self.statistics['staytime']=round((self.statistics['staytime']*self.statistics['pktcount']+getTime-putTime)\
-                        /(self.statistics['pktcount']+1),2)
-
-                self.statistics['inter_arrival_time']=round((self.statistics['inter_arrival_time']*self.statistics['pktcount']\
-                        +putTime-last_arrival)/(self.statistics['pktcount']+1),2)
-
-                self.statistics['inter_departure_time']=round((self.statistics['inter_departure_time']*self.statistics['pktcount']\
-                        +getTime-last_departure)/(self.statistics['pktcount']+1),2)
-
-                self.statistics['pktcount']+=1
-                lastArrival=putTime
-                lastDeparture=getTime
+                self.putCalls.popleft()
+                self.getCalls.popleft()
+                putTime=self.putTimes.popleft()
+                getTime=self.getTimes.popleft()
+
+                n=stats['pktcount']+1
+                for key,x in (('staytime',getTime-putTime),
+                              ('inter_arrival_time',putTime-last_arrival),
+                              ('inter_departure_time',getTime-last_departure)):
+                    delta=x-stats[key]
+                    stats[key]+=delta/n
+                    stats[key+'_ssd']+=delta*(x-stats[key])
+
+                stats['pktcount']=n
+                last_arrival=putTime
+                last_departure=getTime
             yield self.env.timeout(self.monitorInterval)
 
     def bwMonitor(self):
@@ -176,6 +292,11 @@ class Buffer(Component, Store):
             bw_interval = (self.totalWrBits - lastTotalWrBits) / (self.monitorInterval)
             self.wrBw.append(bw_interval)
             lastTotalWrBits=self.totalWrBits
+            self._wrCount+=1
+            self._wrSum+=bw_interval
+            self._wrSqSum+=bw_interval*bw_interval
+            if bw_interval>self._wrMax:
+                self._wrMax=bw_interval
 
             bw_interval = (self.totalRdBits - lastTotalRdBits) / (self.monitorInterval)
             self.rdBw.append(bw_interval)
@@ -186,6 +307,7 @@ class Buffer(Component, Store):
             buffer. The output is two lists:
                 - time: a list of the timestamps indicating the end of intervals in which bandwidth is measured
                 - wrBw: a list with the observed bandwidth at the write side of the buffer in each of the intervals given by time
+            Only the last bwHistorySize intervals are returned when the history is bounded.
 
             Note that the first element of each of the lists is a string prefix(empty by default) providing information for further   a tuple where data format is a list  of which the first element is a string giving 
             processing the actual data starts with index 1 of these lists instead of 0.
@@ -194,8 +316,9 @@ class Buffer(Component, Store):
 
         prefix=''
 
-        time= [prefix]+[t/simTicksPerCycle for t in self.timeSamples]
-        wrBw= [prefix]+[bw*simTicksPerCycle for bw in self.wrBw]
+        # the scaling runs inside map() rather than as a python level loop over every sample
+        time= [prefix,*map(truediv,self.timeSamples,repeat(simTicksPerCycle))]
+        wrBw= [prefix,*map(mul,self.wrBw,repeat(simTicksPerCycle))]
 
         return time, wrBw
 
@@ -218,20 +341,19 @@ class Buffer(Component, Store):
 
 
         name=''
-        stats=[]
-        maxbw=simTicksPerCycle*max(self.wrBw) if self.wrBw!=[] else 0
+        maxbw=simTicksPerCycle*self._wrMax
         firstActivity=self.firstActivity if self.firstActivity else 0
         lastActivity=self.lastActivity if self.lastActivity else 0
         totalBitsSent=self.totalWrBits
-        activeDuration=(self.lastActivity-self.firstActivity) if self.firstActivity!=None else 0
+        activeDuration=(self.lastActivity-self.firstActivity) if self.firstActivity is not None else 0
 
         averagebw0=simTicksPerCycle*(totalBitsSent/activeDuration) if activeDuration  else 0
         averagebw1=simTicksPerCycle*(totalBitsSent/self.env.now)
-        averagebw2=simTicksPerCycle*mean(self.wrBw) if self.wrBw else 0
-        averagebw3=(simTicksPerCycle)*(self.monitorInterval*sum([b**2 for b in self.wrBw]))/totalBitsSent if totalBitsSent  else 0
+        averagebw2=simTicksPerCycle*(self._wrSum/self._wrCount) if self._wrCount else 0
+        averagebw3=(simTicksPerCycle)*(self.monitorInterval*self._wrSqSum)/totalBitsSent if totalBitsSent  else 0
 
 
-        stats=[name,round(maxbw,2),round(averagebw0,2),round(averagebw1,2),round(averagebw2,2),round(averagebw3,2),totalBitsSent,int(firstActivity/simTicksPerCycle),int(lastActivity/simTicksPerCycle),int(self.env.now/simTicksPerCycle)]
+        stats=BwStats(name,round(maxbw,2),round(averagebw0,2),round(averagebw1,2),round(averagebw2,2),round(averagebw3,2),totalBitsSent,int(firstActivity/simTicksPerCycle),int(lastActivity/simTicksPerCycle),int(self.env.now/simTicksPerCycle))
         
         return stats
 
@@ -273,14 +395,19 @@ class Buffer(Component, Store):
 
     def update(self):
 
+        # only the slots whose colour changed since the last tick are reconfigured, and the canvas is
+        # redrawn once per tick rather than once per slot
+        lastFill=['white']*self.capacity
+
         while True:
 
-            for slot in range(len(self.store.items)):
-                self.canvas.itemconfig(self.slots[slot], fill='red')
-                self.canvas.update()
-            for slot in range(len(self.store.items),self.capacity):
-                self.canvas.itemconfig(self.slots[slot], fill='white')
-                self.canvas.update()
+            occupied=len(self.items)
+            for slot in range(self.capacity):
+                fill='red' if slot<occupied else 'white'
+                if fill!=lastFill[slot]:
+                    self.canvas.itemconfig(self.slots[slot], fill=fill)
+                    lastFill[slot]=fill
+            self.canvas.update_idletasks()
 
             yield self.env.timeout(1)
 
@@ -305,25 +432,25 @@ class Buffer(Component, Store):
             """
         return BufferPut(self,item,caller)
 
-    def addPrePutDelay(self, item):
+    def addPrePutDelay(self, item, ticks, debt):
         """ This function adds a put delay before an item is actually appended into
          the store. When yield store.put(item) is called, the following will happen:
              1- block waiting a space to become available
              2- block for the number of ticks returned by this function
              3- append the item the store (store.items.append(item))
              4- block until the number of ticks returned by addDelayAfterPut(), if any
-             5- unblock and return the item"""
+             5- unblock and return the item
+         ticks and debt are the item.getTicks(self.putBytesPerCycle) result, computed once per put by _do_put()"""
 
 
-        return self.putDelay*simTicksPerCycle
+        return self._putDelayTicks
     
-    def addPostPutDelay(self,item):
+    def addPostPutDelay(self, item, ticks, debt):
 
-        ticks,debt=item.getTicks(self.putBytesPerCycle)
         ticks+=int(self.putDebt+debt)
         return ticks*simTicksPerCycle
 
-    def postPutMsg(self, item):
+    def postPutMsg(self, item, postputdelay):
 
         """ This function adds a put delay after an item has been inserted out
         into the store. When yield store.put(item) is called, it will only
@@ -332,42 +459,71 @@ class Buffer(Component, Store):
             THEN;
              2- the number of ticks returned by this function has passed"""
 
-        self.Log('INFO', "Started writing packet {} into the buffer. This will take {} ticks".format(item.uid,self.addPostPutDelay(item)))
+        if self.logger.isEnabledFor(logging.INFO):
+            self.Log('INFO', "Started writing packet {} into the buffer. This will take {} ticks".format(item.uid,postputdelay))
 
     def _do_put(self, event):
 
         if len(self.items) < self._capacity:
-            preputdelay=self.addPrePutDelay(event.item)
-            postputdelay=self.addPostPutDelay(event.item)
+            item=event.item
+            ticks,debt=item.getTicks(self.putBytesPerCycle)
+            preputdelay=self.addPrePutDelay(item,ticks,debt)
+            postputdelay=self.addPostPutDelay(item,ticks,debt)
             event.callbacks.append(self._updateTotalWrBits)
 
             if preputdelay:
-                ev=NewEvent(self.env,item=event.item)
-                ev.callbacks+=[self._insert_packet,self._trigger_get,self._trigger_peek]
-                ev.succeed(delay=preputdelay)
+                self._acquireInsertEvent(item).succeed(postputdelay,delay=preputdelay)
                 event.succeed(delay=postputdelay)
 
             else:
                 event.succeed(delay=postputdelay)
-                self._insert_packet(event)
+                self._insert_packet(item,postputdelay)
                 self._trigger_get(None)
                 self._trigger_peek()
 
             self.lastActivity=self.env.now+postputdelay
 
-            self._updatePutDebt(event.item)
+            self._updatePutDebt(debt)
 
-            if self.firstActivity==None:
+            if self.firstActivity is None:
                 self.firstActivity=self.env.now
 
         return None
 
 
-    def _insert_packet(self,event):
+    def _insert_packet(self,item,postputdelay):
+
+        self.items.append(item)
+
+        self.postPutMsg(item,postputdelay)
+
+    def _insert_delayed_packet(self,event):
+        """callback inserting the packet once the pre-put delay has passed, the event value is the post-put delay"""
+
+        self._insert_packet(event.item,event.value)
+
+    def _acquireInsertEvent(self,item):
+
+        """returns an untriggered event that inserts item when it is processed, reusing a processed one from
+            the pool when available. The event puts itself back in the pool as its last callback; no process waits on it"""
 
-        self.items.append(event.item)
+        pool=self._insertPool
 
-        self.postPutMsg(event.item)
+        callbacks=[self._insert_delayed_packet,self._trigger_get,self._trigger_peek,self._releaseInsertEvent]
+        if pool:
+            event=pool.pop().rearm(item,callbacks)
+        else:
+            event=NewEvent(self.env,item=item)
+            event.callbacks=callbacks
+
+        return event
+
+    def _releaseInsertEvent(self,event):
+
+        """last callback of a pre-put delay event: drops the inserted packet and returns the event to the pool"""
+
+        event.item=None
+        self._insertPool.append(event)
 
     def _putBusy(self,*args):
 
@@ -377,8 +533,7 @@ class Buffer(Component, Store):
         if self.env.now<self.lastActivity:
             self.Log('FATAL_ERROR', "Trying to write into the buffer while another write is ongoing")
 
-    def _updatePutDebt(self,item):
-        ticks,debt=item.getTicks(self.putBytesPerCycle)
+    def _updatePutDebt(self,debt):
         self.putDebt=(self.putDebt+debt)-int(self.putDebt+debt)
 
     def _updateTotalWrBits(self,event):
@@ -425,11 +580,12 @@ class Buffer(Component, Store):
                     yield self.env.process(buffer.get())
 
         """
-        if caller:
-            self.Log("DEBUG","Read request initiated by {}".format(caller.name))
-        else:
+        if self.logger.isEnabledFor(logging.DEBUG):
+            if caller:
+                self.Log("DEBUG","Read request initiated by {}".format(caller.name))
+            else:
 
-            self.Log("DEBUG","Read request initiated")
+                self.Log("DEBUG","Read request initiated")
 
         return BufferGet(self,item,caller)
 
@@ -437,16 +593,16 @@ class Buffer(Component, Store):
         """ This function adds a get delay after an item has been poped out
         of the store. When yield store.get() is called, it will only
         unblock only after:
-             1- the item has been popped out of the store, ie, store.items.pop(0)
+             1- the item has been popped out of the store, ie, store.items.popleft()
              2- the number of ticks returned by this function has passed"""
 
-        return self.getDelay*simTicksPerCycle
+        return self._getDelayTicks
 
     def addPostGetDelay(self, item):
         """ This function adds a get delay after an item has been poped out
         of the store. When yield store.get() is called, it will only
         unblock only after:
-             1- the item has been popped out of the store, ie, store.items.pop(0)
+             1- the item has been popped out of the store, ie, store.items.popleft()
              2- the number of ticks returned by this function has passed"""
 
         ticks,debt=item.getTicks(self.getBytesPerCycle)
@@ -459,10 +615,11 @@ class Buffer(Component, Store):
         """ This function adds a get delay after an item has been poped out
         of the store. When yield store.get() is called, it will only
         unblock only after:
-             1- the item has been popped out of the store, ie, store.items.pop(0)
+             1- the item has been popped out of the store, ie, store.items.popleft()
              2- the number of ticks returned by this function has passed"""
 
-        self.Log( 'INFO', "Started reading packet {} from the buffer. This will take {} ticks".format(item.uid,self.addPostGetDelay(item)))
+        if self.logger.isEnabledFor(logging.INFO):
+            self.Log( 'INFO', "Started reading packet {} from the buffer. This will take {} ticks".format(item.uid,self.addPostGetDelay(item)))
 
     def _do_get(self, event):
 
@@ -471,11 +628,11 @@ class Buffer(Component, Store):
             item=self.items[0]
             pregetdelay=self.addPreGetDelay(item)
             if pregetdelay:
-                event.callbacks+=[self._remove_packet,self._trigger_put,self._updateTotalRdBits]
+                event.callbacks+=[self._remove_packet,self._trigger_put]
                 event.succeed(item,delay=pregetdelay)
 
             else:
-                event.callbacks+=[self._trigger_put,self._updateTotalRdBits]
+                event.callbacks.append(self._trigger_put)
                 self._remove_packet(event)
                 event.succeed(item,delay=pregetdelay)
 
@@ -485,13 +642,10 @@ class Buffer(Component, Store):
 
     def _remove_packet(self,event):
 
-        item=self.items.pop(0)
+        item=self.items.popleft()
+        self.totalRdBits += item.getBytes()*8 #counted here rather than in a callback of its own
         self.postGetMsg(item)
 
-    def _updateTotalRdBits(self,event):
-        
-        self.totalRdBits += event.value.getBytes()*8
-
     def _updateGetDebt(self,item):
 
         ticks,debt=item.getTicks(self.getBytesPerCycle)
@@ -501,42 +655,25 @@ class Buffer(Component, Store):
 
     def peek(self, item=None,caller=None):
 
-        if caller:
-            self.Log("DEBUG","Peek request initiated by {}".format(caller.name))
-        else:
-
-            self.Log("DEBUG","Peek request initiated")
-
-        return BufferPeek(self, item, caller)
-
-    def _trigger_peek(self,*args) -> None:
-        """Trigger peek events.
+        if self.logger.isEnabledFor(logging.DEBUG):
+            if caller:
+                self.Log("DEBUG","Peek request initiated by {}".format(caller.name))
+            else:
 
-        This method is called once a new peek event has been created or a put
-        event has been processed.
+                self.Log("DEBUG","Peek request initiated")
 
-        The method iterates over all put events in the :attr:`put_queue` and
-        calls :meth:`_do_peek` to check if the conditions for the event are met.
-        If :meth:`_do_peek` returns ``False``, the iteration is stopped early.
-        """
+        # fast path: with a packet at the head and no earlier peek waiting, the peek succeeds straight away
+        # without going through the peek_queue
+        if self.items and not self.peek_queue:
+            return NewEvent(self.env,item,caller).succeed(self.items[0])
 
-        # Maintain queue invariant: All peek requests must be untriggered.
-        # This code is not very pythonic because the queue interface should be
-        # simple (only append(), pop(), __getitem__() and __len__() are
-        # required).
-        idx = 0
-        while idx < len(self.peek_queue):
-            peek_event = self.peek_queue[idx]
-            proceed = self._do_peek(peek_event)
-            if not peek_event.triggered:
-                idx += 1
-            elif self.peek_queue.pop(idx) != peek_event:
-                raise RuntimeError('Peek queue invariant violated')
+        return BufferPeek(self, item, caller)
 
-            if not proceed:
-                break
+    def peekNow(self):
+        """returns the packet at the head of the buffer, or None if the buffer is empty, without creating an event.
+        For callers that only need to look at the head synchronously"""
 
-        return None
+        return self.items[0] if self.items else None
 
     def _do_peek(self, event):
 
@@ -580,78 +717,102 @@ class FlowControlledBuffer(Buffer):
 
     def _remove_packet(self,event):
 
-        item=self.items.pop(0)
-        self.postGetMsg(item)
+        Buffer._remove_packet(self,event)
         self.toUp.putCredit()
 
 class StoreAndForwardBuffer(Buffer):
+    """A buffer in which a packet only becomes readable once it has been completely written: the time to write
+    the whole packet (plus putDelay) is spent before the packet is inserted rather than after it.
 
-    def addPrePutDelay(self, item):
+    Both delay hooks receive the ticks/debt of a single item.getTicks() call made by Buffer._do_put(), so a put
+    costs one getTicks() here as in the base class"""
+
+    def addPrePutDelay(self, item, ticks, debt):
 
-        ticks,debt=item.getTicks(self.putBytesPerCycle)
         ticks+=int(self.putDebt+debt)
-        return (ticks+self.putDelay)*simTicksPerCycle
+        return ticks*simTicksPerCycle+self._putDelayTicks
 
-    def addPostPutDelay(self, item):
+    def addPostPutDelay(self, item, ticks, debt):
 
-        ticks,debt=item.getTicks(self.putBytesPerCycle)
         ticks+=int(self.putDebt)
         return ticks*simTicksPerCycle
 
-class CreditBuffer(Component, Store):
+class CreditBuffer(Component, _PeekableStore):
 
     def __init__(self,env,name='',parent=None, initCredits=4):
 
         Component.__init__(self, env, name, parent)
-        Store.__init__(self,env,initCredits)
-        self.peek_queue=[]
-        self.items=[1]*initCredits
+        _PeekableStore.__init__(self,env,initCredits)
+        self._credits=initCredits #credits are interchangeable tokens, only their number is kept
+
+    @property
+    def items(self):
+        """the available credits, exposed as a range so that len() and truth tests keep working on them"""
+        return range(self._credits)
+
+    @items.setter
+    def items(self,items):
+        self._credits=len(items)
+
+    @property
+    def credits(self):
+        """the number of available credits"""
+        return self._credits
+
+    def takeCredit(self):
+        """consumes one credit on the spot, without the event get() creates. The caller must have checked that credits is non zero"""
+
+        self._credits-=1
+        if self.put_queue:
+            self._trigger_put(None)
+
+    def returnCredit(self):
+        """adds one credit back on the spot, without the event put() creates, and serves the gets and peeks it unblocks.
+        A credit returned while the buffer is full is queued through put() as before"""
+
+        if self._credits < self._capacity:
+            self._credits+=1
+            self._trigger_get(None)
+            self._trigger_peek()
+        else:
+            self.put(1)
 
     def put(self,item):
 
-        storePut=StorePut(self,item)
-        storePut.callbacks.append(self._trigger_peek)
+        storePut=BufferPut(self,item)
+        # nothing can have been appended to the callbacks of a request just created
+        storePut.callbacks=[self._trigger_get,self._trigger_peek]
 
         return storePut
 
-    def peek(self,thresh=1):
+    def get(self):
 
-        return BufferPeek(self,thresh)
+        storeGet=BufferGet(self)
+        storeGet.callbacks=[self._trigger_put]
 
-    def _trigger_peek(self,*args) -> None:
-        """Trigger peek events.
+        return storeGet
 
-        This method is called once a new peek event has been created or a put
-        event has been processed.
-
-        The method iterates over all put events in the :attr:`put_queue` and
-        calls :meth:`_do_peek` to check if the conditions for the event are met.
-        If :meth:`_do_peek` returns ``False``, the iteration is stopped early.
-        """
+    def peek(self,thresh=1):
 
-        # Maintain queue invariant: All peek requests must be untriggered.
-        # This code is not very pythonic because the queue interface should be
-        # simple (only append(), pop(), __getitem__() and __len__() are
-        # required).
+        return BufferPeek(self,thresh)
 
-        idx = 0
-        while idx < len(self.peek_queue):
-            peek_event = self.peek_queue[idx]
-            proceed = self._do_peek(peek_event)
+    def _do_put(self, event):
 
-            if not peek_event.triggered:
-                idx += 1
-            elif self.peek_queue.pop(idx) != peek_event:
-                raise RuntimeError('Peek queue invariant violated')
+        if self._credits < self._capacity:
+            self._credits+=1
+            event.succeed()
+        return None
 
-            if not proceed:
-                break
+    def _do_get(self, event):
 
+        if self._credits:
+            self._credits-=1
+            event.succeed(1)
         return None
 
     def _do_peek(self, event):
 
-        if len(self.items)>event.item:
+        if self._credits>event.item:
             #check if the number of available credit is greater than or equals the threshold indicated by event.item
             event.succeed()
             return True
@@ -1,7 +1,13 @@
 #-----------------------------------------------------------
                 #Basic Packet Class
 #-----------------------------------------------------------
-import math
+from functools import lru_cache
+from itertools import count
+
+@lru_cache(maxsize=4096)
+def _ticks(nbytes, bytesPerCycle):
+    """(ticks, debt) taken to process nbytes at bytesPerCycle. Memoized, as a simulation only sees a few distinct pairs"""
+    return -(-nbytes//bytesPerCycle),0 #integer ceiling division, no round trip through float
 
 class BasePacket(object):
 
@@ -13,9 +19,10 @@ class BasePacket(object):
         * _headerbytes : number of bytes in the header of the packet
         * _payloadbytes: number of bytes in the payload of the packet
         *  f           : a dictionary of fields {fieldName:fieldValue} that can customized
-        * uid: a unique identifier of the packet, incremented for each new instance of the class
+        * uid: a unique integer identifier of the packet, incremented for each new instance of the class
 
     The packet has the following methods:
+        * acquire()/release(): pooled alternative to instantiating the class, for systems that create and consume packets in bulk
         * setSize(): customizable method to set the payload and headerbytes based on the fields with which the packet is initialized
         * getBytes(): returns the total number of bytes a packet contains (header + payload)
         * getTicks(bytesPerTick): takes as argument the width of the channel on which the packet is being transmitted 
@@ -28,20 +35,39 @@ class BasePacket(object):
     
    """
 
-    nextuid=0
-    def __init__(self, fields={}):
+    # subclasses that do not declare their own __slots__ get a __dict__ back
+    __slots__ = ('_payloadBytes', '_headerBytes', 'uid', 'f')
+
+    _uids=count() #source of the packet uids, shared by all subclasses
+    _freeLists={} #per packet class, released packets ready to be reused by acquire()
+
+    @classmethod
+    def acquire(cls, fields=None):
+        """Returns a packet of this class, reusing a released one when available. A reused packet is
+        re-initialized by calling __init__(fields) on it, so it gets a new uid and its size set again from fields,
+        exactly as a new instance would. Pooled subclasses must therefore keep the __init__(self, fields=None) signature"""
+        freeList=BasePacket._freeLists.get(cls)
+        if freeList:
+            pkt=freeList.pop()
+            pkt.__init__(fields)
+            return pkt
+        return cls(fields)
+
+    def release(self):
+        """Hands the packet back for reuse by acquire(). The caller must hold the last reference to it"""
+        BasePacket._freeLists.setdefault(type(self),[]).append(self)
+
+    def __init__(self, fields=None):
 
         self._payloadBytes=0
         self._headerBytes=0
         self.uid=self.nextid()
-        self.f=fields
+        self.f={} if fields is None else fields
         self.setSize()
 
     def nextid(self):
-        """Obtain the next unique packet id. Increments the class variable ==nextuid=="""
-        uid = BasePacket.nextuid
-        BasePacket.nextuid += 1
-        return str(uid)
+        """Obtain the next unique packet id, as an int. It is only turned into a string when a message shows it"""
+        return next(BasePacket._uids)
 
     def setSize(self):
         #sets the size of the header (if any) and the header (if any) in bytes
@@ -56,5 +82,5 @@ class BasePacket(object):
         
         #returns the number of ticks processing the packet will take, where the processor's capability is provided as an argument (bytesPerCycle)
 
-        return math.ceil(self.getBytes()/bytesPerCycle),0
+        return _ticks(self.getBytes(),bytesPerCycle)
 
@@ -1,7 +1,11 @@
-from Components.BasicComponent import Component
+from Components.BasicComponent import Component, BwStats
+import logging
 from simpyExtensions.util import NewEvent, PipelinePut
 from Components.Buffers import CreditBuffer
 from SimSettings import simTicksPerCycle
+from itertools import repeat
+from collections import deque
+from operator import mul, truediv
 #-----------------------------------------------------------------
 #Generic Pipeline, Flow Controlled Pipeline
 #-----------------------------------------------------------------
@@ -21,24 +25,41 @@ class Pipeline(Component):
 
     """
 
-    def __init__(self, env, name, parent=None, depth=1, putBytesPerCycle=16,monitorBW=False,monitorInterval=250):
+    def __init__(self, env, name, parent=None, depth=1, putBytesPerCycle=16,monitorBW=False,monitorInterval=250,bwHistorySize=None):
 
         Component.__init__(self,env, name, parent)
         self.fromDn=self
         self.fromUp=self
-        self.putBusy=False
         self.putBytesPerCycle=putBytesPerCycle
         self.depth = depth
         """Queue of pending *put* requests."""
-        self.put_queue = []
+        self.put_queue = deque()
         self.putDebt=0
         self.monitorBW=monitorBW
         self.monitorInterval=monitorInterval*simTicksPerCycle
-        self.timeSamples=[]
+        # as in Buffer, only the last bwHistorySize samples are kept (all of them if None), the
+        # running aggregates below cover the whole simulation
+        self.timeSamples=deque(maxlen=bwHistorySize)
         self.totalBitsSent=0
         self.lastActivity=None
         self.firstActivity=None
-        self.bw=[]
+        self.bw=deque(maxlen=bwHistorySize)
+        self._bwCount=0 #number of bandwidth samples taken
+        self._bwSum=0 #running sum of the bandwidth samples
+        self._bwSqSum=0 #running sum of their squares
+        self._bwMax=0 #largest bandwidth sample
+        self._statsKey=None #(totalBitsSent,_bwCount,now) the cached dumpStats() result was computed for
+        self._stats=None
+        self._deliverPool=[] #processed delivery events ready for reuse, see _putdelay()
+
+    @property
+    def depth(self):
+        return self._depth
+
+    @depth.setter
+    def depth(self,depth):
+        self._depth=depth
+        self._depthTicks=depth*simTicksPerCycle #scaled once here rather than for every packet and credit
 
     def run(self):
         if self.monitorBW:
@@ -52,14 +73,14 @@ class Pipeline(Component):
         succeeds."""
         return PipelinePut(self, item, caller=caller)
 
-    def addPostPutDelay(self,item):
+    def addPostPutDelay(self, item, ticks, debt):
+        """ticks and debt are the item.getTicks(self.putBytesPerCycle) result, computed once per put by _do_put()"""
 
-        ticks,debt=item.getTicks(self.putBytesPerCycle)
         extra=int(self.putDebt+debt)
         ticks+=extra
         return ticks*simTicksPerCycle
 
-    def prePutMsg(self, event):
+    def prePutMsg(self, event, ticks):
 
         """ This function adds a put delay after an item has been inserted out
         into the store. When yield store.put(item) is called, it will only 
@@ -68,7 +89,8 @@ class Pipeline(Component):
             THEN;
              2- the number of ticks returned by this function has passed"""
 
-        self.Log( 'INFO', "Started sending packet {} down the pipeline. This will take {} simTicks".format(event.item.uid,self.addPostPutDelay(event.item)))
+        if self.logger.isEnabledFor(logging.INFO):
+            self.Log( 'INFO', "Started sending packet %s down the pipeline. This will take %d simTicks", event.item.uid, ticks)
 
     def postPutMsg(self, event):
 
@@ -79,33 +101,43 @@ class Pipeline(Component):
             THEN;
              2- the number of ticks returned by this function has passed"""
 
-        self.Log( 'INFO', "Finished sending Packet {} down the pipeline".format(event.item.uid))
+        if self.logger.isEnabledFor(logging.INFO):
+            self.Log( 'INFO', "Finished sending Packet %s down the pipeline", event.item.uid)
 
 
-    def _putBusy(self,*args):
+    def _putdelay(self,item):
 
-        if self.putBusy:
-            self.Log( 'FATAL_ERROR', "Trying to put() through the pipeline while busy")
-        else:    
-            self.putBusy=True
+        """schedules the write of item into downstream once its first flit has crossed the pipeline. A single event
+        with a callback does this: nothing waits on the downstream put, so no process is needed to drive it.
+        Processed delivery events are pooled and reused, the event puts itself back as its last callback"""
 
-    def _putReady(self,*args):
+        if not hasattr(self.toDn,'put'):
+            self.Log("FATAL_ERROR","%s has no put method", self.toDn)
+        pool=self._deliverPool
+        callbacks=[self._deliver,self._releaseDeliverEvent]
+        if pool:
+            deliverEvent=pool.pop().rearm(item,callbacks)
+        else:
+            deliverEvent=NewEvent(self.env,item=item)
+            deliverEvent.callbacks=callbacks
+        deliverEvent.succeed(delay=self._depthTicks) #time for first flit to be received
 
-        self.putBusy=False
+    def _deliver(self,deliverEvent):
 
-    def _putdelay(self,item):
+        self.toDn.put(deliverEvent.item) # writing the packet into downstream
 
-        if not hasattr(self.toDn,'put'):
-            self.Log("FATAL_ERROR","{} has no put method")
-        yield self.env.timeout(self.depth*simTicksPerCycle) #time for first flit to be received
-        yield self.toDn.put(item) # writing the packet into downstream
+    def _releaseDeliverEvent(self,deliverEvent):
 
-    def _updatePutDebt(self,item):
-        ticks,debt=item.getTicks(self.putBytesPerCycle)
-        self.putDebt=(self.putDebt+debt)-int(self.putDebt+debt)
+        """last callback of a delivery event: drops the delivered packet and returns the event to the pool"""
 
-    def _updateTotalBitsSent(self,event):
-        
+        deliverEvent.item=None
+        self._deliverPool.append(deliverEvent)
+
+    def _putDone(self,event):
+
+        """single callback run when a put completes: reports it and accounts its bits"""
+
+        self.postPutMsg(event)
         self.totalBitsSent += event.item.getBytes()*8
         self.lastActivity=self.env.now
 
@@ -121,39 +153,41 @@ class Pipeline(Component):
         ``False``.
         """
         pkt=event.item
-        ticks=self.addPostPutDelay(pkt)
-        event.callbacks.append(self.postPutMsg)
-        event.callbacks.append(self._updateTotalBitsSent)
-        self.prePutMsg(event)
+        pktTicks,debt=pkt.getTicks(self.putBytesPerCycle)
+        ticks=self.addPostPutDelay(pkt,pktTicks,debt)
+        event.callbacks.append(self._putDone)
+        self.prePutMsg(event,ticks)
         event.succeed(delay=ticks)
-        self.env.process(self._putdelay(pkt))
+        self._putdelay(pkt)
 
-        if self.firstActivity==None:
+        if self.firstActivity is None:
             self.firstActivity=self.env.now
         
-        self._updatePutDebt(pkt)
+        debt+=self.putDebt
+        self.putDebt=debt-int(debt) #only the fractional part of the debt carries over to the next packet
 
     def _trigger_put(self,put_event=None):
         """This method is called once a new put event has been created or a get
         event has been processed.
 
-        The method iterates over all put events in the :attr:`put_queue` and
-        calls :meth:`_do_put` to check if the conditions for the event are met.
-        If :meth:`_do_put` returns ``False``, the iteration is stopped early.
+        The method serves the put events in the :attr:`put_queue` in order,
+        calling :meth:`_do_put` for each of them. It stops at the first event
+        left untriggered or once :meth:`_do_put` returns ``False``, so served
+        events are always popped from the head of the queue in O(1). Cancelled
+        events are tombstones, dropped as they reach the head.
         """
 
-        # Maintain queue invariant: All put requests must be untriggered.
-        # This code is not very pythonic because the queue interface should be
-        # simple (only append(), pop(), __getitem__() and __len__() are
-        # required).
-        idx = 0
-        while idx < len(self.put_queue):
-            put_event = self.put_queue[idx]
-            proceed = self._do_put(put_event)
+        put_queue=self.put_queue
+        do_put=self._do_put
+        while put_queue:
+            put_event = put_queue[0]
+            if put_event._cancelled:
+                put_queue.popleft()
+                continue
+            proceed = do_put(put_event)
             if not put_event.triggered:
-                idx += 1
-            elif self.put_queue.pop(idx) != put_event:
-                raise RuntimeError('Put queue invariant violated')
+                break
+            put_queue.popleft()
 
             if not proceed:
                 break
@@ -170,6 +204,11 @@ class Pipeline(Component):
             yield self.env.timeout(self.monitorInterval)
             bw_interval = (self.totalBitsSent - lastTotalBitsSent) / (self.monitorInterval)
             self.bw.append(bw_interval)
+            self._bwCount+=1
+            self._bwSum+=bw_interval
+            self._bwSqSum+=bw_interval*bw_interval
+            if bw_interval>self._bwMax:
+                self._bwMax=bw_interval
             lastTotalBitsSent=self.totalBitsSent
             self.timeSamples.append(self.env.now)
 
@@ -192,28 +231,36 @@ class Pipeline(Component):
 
 
         name=''
-        time= [name]+[t/simTicksPerCycle for t in self.timeSamples]
-        sendBw= [name]+[bw*simTicksPerCycle for bw in self.bw]
+        time= [name,*map(truediv,self.timeSamples,repeat(simTicksPerCycle))]
+        sendBw= [name,*map(mul,self.bw,repeat(simTicksPerCycle))]
 
         return time, sendBw
 
     def dumpStats(self):
         
-        """returns a list of statistics on the operation: 
-                1- """
+        """returns a BwStats tuple of statistics on the operation: 
+                1- 
+            the result is kept until a bit is sent, a bandwidth sample is taken or time advances, so repeated
+            report calls reuse it"""
+        statsKey=(self.totalBitsSent,self._bwCount,self.env.now)
+        if statsKey==self._statsKey:
+            return self._stats
+
         name=''
-        maxbw=simTicksPerCycle*max(self.bw) if self.bw!=[] else 0
+        maxbw=simTicksPerCycle*self._bwMax
         firstActivity=self.firstActivity if self.firstActivity else 0
         lastActivity=self.lastActivity if self.lastActivity else 0
         totalBitsSent=self.totalBitsSent
-        activeDuration=(self.lastActivity-self.firstActivity) if self.firstActivity!=None else 0
+        activeDuration=(self.lastActivity-self.firstActivity) if self.firstActivity is not None else 0
 
         averagebw0=simTicksPerCycle*(totalBitsSent/activeDuration) if activeDuration  else 0
         averagebw1=simTicksPerCycle*(totalBitsSent/self.env.now)
-        averagebw2=simTicksPerCycle*mean(self.bw) if self.bw else 0
-        averagebw3=(simTicksPerCycle)*(self.monitorInterval*sum([b**2 for b in self.bw]))/totalBitsSent if totalBitsSent  else 0
+        averagebw2=simTicksPerCycle*(self._bwSum/self._bwCount) if self._bwCount else 0
+        averagebw3=(simTicksPerCycle)*(self.monitorInterval*self._bwSqSum)/totalBitsSent if totalBitsSent  else 0
 
-        stats=[name,round(maxbw,2),round(averagebw0,2),round(averagebw1,2),round(averagebw2,2),round(averagebw3,2),totalBitsSent,int(firstActivity/simTicksPerCycle),int(lastActivity/simTicksPerCycle),int(self.env.now/simTicksPerCycle)]
+        stats=BwStats(name,round(maxbw,2),round(averagebw0,2),round(averagebw1,2),round(averagebw2,2),round(averagebw3,2),totalBitsSent,int(firstActivity/simTicksPerCycle),int(lastActivity/simTicksPerCycle),int(self.env.now/simTicksPerCycle))
+        self._statsKey=statsKey
+        self._stats=stats
         
         return stats
 
@@ -230,33 +277,51 @@ class FlowControlledPipeline(Pipeline):
     the item will hog the pipeline for. THIS IS DIFFERENT THAN THE TIME TAKEN TO REACH THE
     END OF THE PIPELINE (that is given by the depth parameter)
 
+    initCredits=None disables the flow control: puts never wait for a credit and the credits returned
+    by downstream are dropped.
+
     """
 
-    def __init__(self, env, name, parent=None, depth=1,putBytesPerCycle=16,initCredits=4,monitorBW=False,monitorInterval=250):
+    def __init__(self, env, name, parent=None, depth=1,putBytesPerCycle=16,initCredits=4,monitorBW=False,monitorInterval=250,bwHistorySize=None):
 
-        Pipeline.__init__(self,env, name, parent,depth,putBytesPerCycle,monitorBW,monitorInterval)
-        self.CreditBuffer=CreditBuffer(self.env,'creditbuffer',parent=self, initCredits=initCredits)
+        Pipeline.__init__(self,env, name, parent,depth,putBytesPerCycle,monitorBW,monitorInterval,bwHistorySize)
         self.initCredits=initCredits
+        if initCredits is None:
+            # the credit handling is bound away once here rather than tested on every put
+            self.CreditBuffer=None
+            self._do_put=Pipeline._do_put.__get__(self)
+            self.putCredit=self._dropCredit
+        else:
+            self.CreditBuffer=CreditBuffer(self.env,'creditbuffer',parent=self, initCredits=initCredits)
 
     def waitForCredit(self,*args,**kwargs):
 
+        if self.CreditBuffer is None:
+            return NewEvent(self.env).succeed()
         return self.CreditBuffer.peek()
 
+    def _dropCredit(self,*args):
+
+        pass
+
     def _increment_credit(self,*args):
 
-        if len(self.CreditBuffer.items)==self.initCredits:
+        if self.CreditBuffer.credits==self.initCredits:
 
             self.Log( 'FATAL_ERROR', "received credit while credit counter is saturated")
 
-        self.CreditBuffer.put(1)
-        self.Log('INFO', "credit received from downstream")
+        self.CreditBuffer.returnCredit()
+        if self.logger.isEnabledFor(logging.INFO):
+            self.Log('INFO', "credit received from downstream")
 
     def putCredit(self,*args):
 
         putCreditEvent=NewEvent(self.env)
-        putCreditEvent.callbacks+=[self._increment_credit,self._trigger_put]
-        self.toDn.Log('INFO', "credit dispatched")
-        putCreditEvent.succeed(delay=self.depth*simTicksPerCycle)
+        putCreditEvent.callbacks=[self._increment_credit,self._trigger_put]
+        toDn=self.toDn
+        if toDn.logger.isEnabledFor(logging.INFO):
+            toDn.Log('INFO', "credit dispatched")
+        putCreditEvent.succeed(delay=self._depthTicks)
 
     def _do_put(self, event):
         """Perform the *put* operation.
@@ -269,21 +334,24 @@ class FlowControlledPipeline(Pipeline):
         :attr:`put_queue`, as long as the return value does not evaluate
         ``False``.
         """
-        if self.CreditBuffer.items:
+        creditBuffer=self.CreditBuffer
+        if creditBuffer.credits:
 
-            self.CreditBuffer.get()
-            self.Log( 'DEBUG', "credit consumed. {} remaining credits".format(len(self.CreditBuffer.items)))
+            creditBuffer.takeCredit()
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.Log( 'DEBUG', "credit consumed. %d remaining credits", creditBuffer.credits)
             
             pkt=event.item
-            ticks=self.addPostPutDelay(pkt)
-            event.callbacks.append(self.postPutMsg)
-            event.callbacks.append(self._updateTotalBitsSent)
+            pktTicks,debt=pkt.getTicks(self.putBytesPerCycle)
+            ticks=self.addPostPutDelay(pkt,pktTicks,debt)
+            event.callbacks.append(self._putDone)
 
-            self.prePutMsg(event)
+            self.prePutMsg(event,ticks)
             event.succeed(delay=ticks)
-            self.env.process(self._putdelay(event.item))
+            self._putdelay(pkt)
 
-            if not self.firstActivity:
+            if self.firstActivity is None:
                 self.firstActivity=self.env.now
 
-            self._updatePutDebt(pkt)
\ No newline at end of file
+            debt+=self.putDebt
+            self.putDebt=debt-int(debt)
\ No newline at end of file
@@ -10,9 +10,9 @@ class Platform(Unit):
 
     def insertUnit(self,unitinstance):
 
-        unitType=type(unitinstance).__name__
+        self.units[unitinstance.name]=unitinstance
 
-        # if not unitType in self.units:
-        #     self.units[unitType]={}
+    def insertUnits(self,unitinstances):
+        """inserts several units at once, keyed by their name like insertUnit()"""
 
-        self.units[unitinstance.name]=unitinstance
+        self.units.update((unitinstance.name,unitinstance) for unitinstance in unitinstances)
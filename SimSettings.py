@@ -1 +1,4 @@
-simTicksPerCycle=2
\ No newline at end of file
+simTicksPerCycle=2
+# set to False before importing any component module to turn DEBUG/INFO logging into a no-op for batch runs.
+# Warnings and errors are still reported
+logEnabled=True
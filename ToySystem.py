@@ -3,6 +3,35 @@ import logging
 import SimSettings
 import simpy
 from simpy import AllOf, Event
+from collections import deque, namedtuple
+from functools import lru_cache
+
+# logging function of each supported Log() message type, errors are logged at info level before being raised
+_LOG_FUNCS = {'INFO': logging.info, 'WARNING': logging.warning, 'FATAL_ERROR': logging.info, 'CONFIG_ERROR': logging.info}
+_ERROR_MSGTYPES = frozenset(('FATAL_ERROR', 'CONFIG_ERROR'))
+
+@lru_cache(maxsize=4096)
+def _bcbitmap_str(bcbitmap):
+    """the '0b' prefixed, 16 digit binary form of a broadcast bitmap in the packet records. Memoized, as only a few distinct bitmaps are recorded"""
+    return format(bcbitmap, '#018b')
+
+# one packet record written by Component.record_packets()
+_PKT_RECORD_FMT = "    <%s time=\"%d\", dir=\"%d\", block=\"%s\", type=\"%s\", srcipudid=\"%s\", srctileid=\"%s\", bcbitmap=\"%s\", desttileid=\"%s\", readlength=\"%s\", size=\"%s\"/>"
+
+# the fields of an egress routing register (EGRNR/EGRSR) a TR matches packets against, read once per TIB process
+EgrrConfig = namedtuple('EgrrConfig', 'tilebm ipubm ipumen tilemen eglane pcieg mode match')
+
+def _egress_matcher(mode, tilebm, ipubm):
+    """returns the tile/ipu match test of an egress routing register, specialised once for its mode (IPUMEN<<1 | TILEMEN)
+    so that each packet only evaluates the matches the register enables, against masks bound in the closure"""
+
+    if mode == 3:
+        return lambda packet: bool((1 << ((packet.tileid & 0x38) >> 3)) & tilebm) and bool(packet.bcbitmap & ipubm)
+    if mode == 2:
+        return lambda packet: bool(packet.bcbitmap & ipubm)
+    if mode == 1:
+        return lambda packet: bool((1 << ((packet.tileid & 0x38) >> 3)) & tilebm)
+    return lambda packet: False
 
 class Component(object):
     """Base class for all components that collects common member vars and implements common logging
@@ -26,6 +55,7 @@ class Component(object):
         config (dict)           : see comments above"""
 
     packet_record_files = None
+    pktfilter = None
     
 
     def __init__(self, env, name, parentname, config=None):
@@ -48,6 +78,8 @@ class Component(object):
 
     @classmethod
     def EnablePacketRecording(cls, filelist):
+        """filelist maps each parent name to its (in, out) pair of open record files. record_packets() writes them
+        once per packet list, so opening them with a large buffer (e.g. buffering=1<<20) keeps the syscalls few"""
         cls.packet_record_files = filelist
         for colossus in filelist:
                 cls.packet_record_files[colossus][0].write("<root>\n  <packets>")
@@ -56,9 +88,10 @@ class Component(object):
     def record_packets(cls, simtime, pktlist, pkttype, in_n_out, instname, parentname):
         fh = Newsim.packet_record_files[parentname][in_n_out]
 
-        for pkt in pktlist:
-            fh.write("    <%s time=\"%d\", dir=\"%d\", block=\"%s\", type=\"%s\", srcipudid=\"%s\", srctileid=\"%s\", bcbitmap=\"%s\", desttileid=\"%s\", readlength=\"%s\", size=\"%s\"/>"  %(
-                pkttype, simtime, in_n_out, instname, pkt.type, pkt.srcipuid, pkt.srctileid, format(pkt.bcbitmap, '#018b'), pkt.tileid, pkt.readlength, pkt.size))
+        # the records of the whole list are joined and handed to the file in a single write
+        fh.write(''.join([_PKT_RECORD_FMT % (
+                pkttype, simtime, in_n_out, instname, pkt.type, pkt.srcipuid, pkt.srctileid, _bcbitmap_str(pkt.bcbitmap), pkt.tileid, pkt.readlength, pkt.size)
+            for pkt in pktlist]))
 
 
     def run(self):
@@ -66,50 +99,108 @@ class Component(object):
 
         yield self.env.timeout(1)
 
-    def Log(self, msgtype, msg, pkt=None, infolist=None):
+    def Log(self, msgtype, msg, *args, pkt=None, infolist=None):
         """Common logging function used by all descendents of Component base class
 
         Arguments:
            msgtype(string) : One of 'INFO', 'WARNING', 'CONFIG_ERROR', 'FATAL_ERROR'
            msg(string)     : The message to be logged, specified by the Newmanry object
+           args            : Optional %-style arguments of msg, only interpolated if the message is emitted
            pkt(PktHdr)     : Packet related messages may pass the packet concerned in order to enable
                              packet info message filtering
            infolist(list)  : Some messages may pass this list of strings as arbitrary additional debug
                              info to be logged"""
 
-        # construct the output from the current sim time, objects full pathname and the passed message
-        fullmsg = '[@%d]%s : %s' % (self.env.now, self.fullname, msg)
-        displayinfo = True
-
-        # determine whether output should be suppressed based on packet filter argument
-        if self.pktfilter:
-            # suppression only applies to Log() calls which also pass a packet object as an argument
-            if pkt is not None:
-                if pkt.uid != self.pktfilter:
-                    displayinfo = False
-
-        # always output the message if it is an error message or warning
-        if msgtype == 'FATAL_ERROR' or msgtype == 'CONFIG_ERROR':
-            logging.info(fullmsg)
-        elif msgtype == 'WARNING':
-            logging.warning(fullmsg)
-        elif msgtype == 'INFO':
-            # info messages can be suppressed according to packet id
-            if displayinfo:
-                logging.info(fullmsg)
-        else:
+        log = _LOG_FUNCS.get(msgtype)
+        if log is None:
             raise RuntimeError("Newsim.log: Unsupported message type [%s] in %s " % (msgtype, self.fullname))
 
+        # determine whether output should be suppressed based on packet filter argument. Suppression only
+        # applies to Log() calls which also pass a packet object as an argument
+        displayinfo = not (self.pktfilter and pkt is not None and pkt.uid != self.pktfilter)
+
+        # info messages can be suppressed according to packet id, they return before any formatting is done.
+        # Errors and warnings are always output
+        error = msgtype in _ERROR_MSGTYPES
+        if not displayinfo and msgtype == 'INFO':
+            return
+
+        # the output is built from the current sim time, objects full pathname and the passed message. The
+        # arguments are handed to the logger unformatted so that discarded messages are never interpolated
+        if args:
+            log('[@%d]%s : ' + msg, self.env.now, self.fullname, *args)
+        else:
+            log('[@%d]%s : %s', self.env.now, self.fullname, msg)
+
         # some messages pass a list of strings which provides more debug info relating to the message
-        # if this argument is present, print out the strings (unless message is being suppressed)
-        if infolist and displayinfo:
-            logging.info("\tInfodump follows:")
-            for item in infolist:
-                logging.info("\t%s" % item)
+        # if this argument is present, print out the strings as one message (unless message is being suppressed
+        # or the dump would be discarded by the logger anyway)
+        if infolist and displayinfo and logging.root.isEnabledFor(logging.INFO):
+            logging.info("\tInfodump follows:\n\t%s", "\n\t".join(map(str, infolist)))
 
         # finally, if the message was an error, raise an exception.
-        if msgtype is 'FATAL_ERROR' or msgtype is 'CONFIG_ERROR':
-            raise RuntimeError(fullmsg)
+        if error:
+            raise RuntimeError('[@%d]%s : %s' % (self.env.now, self.fullname, msg % args if args else msg))
+
+# the weightless marker put into the ingress_tail store of an IgPort after each packet header
+_TAIL = 'tail'
+
+class FifoStore(simpy.Store):
+    """simpy Store specialised for the FIFO buffers of an IgPort: the items and the pending put/get events are held
+    in deques and served strictly from their heads, so every put/get costs O(1) instead of simpy's list scan and
+    list.pop(0). The Store API (put(), get(), items, capacity) is unchanged"""
+
+    PutQueue = deque
+    GetQueue = deque
+
+    def __init__(self, env, capacity=float('inf')):
+        simpy.Store.__init__(self, env, capacity)
+        self.items = deque()
+        # one put event shared by every put_now() that completes on the spot. It is succeeded here and processed by
+        # the environment's next step, at the current sim time, after which yielding it resumes a process straight away
+        self._done = Event(env).succeed()
+
+    def put_now(self, item):
+        """Like put(), but an item accepted on the spot returns the shared, already succeeded put event instead of a
+        new one. A process yielding it resumes straight away without a new event being scheduled"""
+
+        items = self.items
+        if self.put_queue or len(items) >= self._capacity:
+            return self.put(item)
+        items.append(item)
+        self._trigger_get(None)
+        return self._done
+
+    def _do_put(self, event):
+        items = self.items
+        if len(items) < self._capacity:
+            items.append(event.item)
+            event.succeed()
+
+    def _do_get(self, event):
+        items = self.items
+        if items:
+            event.succeed(items.popleft())
+
+    def _trigger_put(self, get_event):
+        # a put left waiting means the store is full, so the ones queued behind it cannot be served either
+        put_queue = self.put_queue
+        while put_queue:
+            put_event = put_queue[0]
+            self._do_put(put_event)
+            if not put_event.triggered:
+                break
+            put_queue.popleft()
+
+    def _trigger_get(self, put_event):
+        # likewise a get left waiting means the store is empty
+        get_queue = self.get_queue
+        while get_queue:
+            get_event = get_queue[0]
+            self._do_get(get_event)
+            if not get_event.triggered:
+                break
+            get_queue.popleft()
 
 class IgPort(Component):
 
@@ -120,6 +211,8 @@ class IgPort(Component):
         occwarn(bool) : If this is True then a warning will be printed (once)
                         when/if the buffer reaches maximum occupancy, and
                         occupancy stats gathering will be enabled
+        stats_history(int): number of occupancy samples kept in self.stats, all of
+                        them if None
 
        This object is vital to the simulation structure. It consists of three
        stores: ingress, ingress_tail and pipeline. The first two stores are
@@ -138,13 +231,25 @@ class IgPort(Component):
 
        The pipeline store is used to model a fixed pipeline delay into which all the
        relevant pipeline delays of the parent block are lumped. The
-       run_pipe() process starts a new Simpy Process (latency() for each packet
-       which just waits a number of timeticks equal to self.pipedelay and then
-       puts the packet to the pipeline store. A maximum of n latency processes will
-       be active at any one time where n = self.pipedelay
+       run_pipe() process schedules a timeout for each packet which fires after
+       a number of timeticks equal to self.pipedelay, its latency() callback then
+       puts the packet to the pipeline store. A maximum of n latency timeouts will
+       be pending at any one time where n = self.pipedelay
+
+       Simulations where all packets have the same size can drop the tails with
+       SetDisableTails(True): put_tail()/get_tail() then return an already
+       succeeded event and the ingress_tail store is never touched.
        """
 
-    def __init__(self, env, name, parentname, depth=1, occwarn=True):
+    disable_tails = False
+
+    @classmethod
+    def SetDisableTails(cls, disable):
+        """Sets the class variable that turns the tail markers of all IgPorts into already succeeded events"""
+
+        cls.disable_tails = disable
+
+    def __init__(self, env, name, parentname, depth=1, occwarn=True, stats_history=None):
         Component.__init__(self, env, name, parentname)
 
 
@@ -162,13 +267,32 @@ class IgPort(Component):
 
         self.monitor_interval = 200
         self.stats = {}
-        self.stats['occupancy']  = []
-        self.stats['sampletimes'] = []
+        # as for the bandwidth history of Buffer/Pipeline, only the last stats_history samples are kept (all of them if None)
+        self.stats['occupancy']  = deque(maxlen=stats_history)
+        self.stats['sampletimes'] = deque(maxlen=stats_history)
 
-        self.ingress = simpy.Store(self.env, capacity=depth) #a store for the headers of the packets
-        self.ingress_tail = simpy.Store(self.env, capacity=depth) #a store for the payloads of the packets
-        self.pipeline = simpy.Store(self.env, capacity=depth) # a store for the processed headers (includes pipeline delays)
+        self.ingress = FifoStore(self.env, capacity=depth) #a store for the headers of the packets
+        self.ingress_tail = FifoStore(self.env, capacity=depth) #a store for the payloads of the packets
+        self.pipeline = FifoStore(self.env, capacity=depth) # a store for the processed headers (includes pipeline delays)
 
+        # bound methods used for every packet, looked up once here
+        self._get_ingress = self.ingress.get
+        self._put_ingress = self.ingress.put
+        self._get_ingress_tail = self.ingress_tail.get
+        self._put_ingress_tail = self.ingress_tail.put_now
+        self._get_pipeline = self.pipeline.get
+        self._put_pipeline = self.pipeline.put
+        self._timeout = self.env.timeout
+
+
+    @property
+    def pipedelay(self):
+        return self._pipedelay
+
+    @pipedelay.setter
+    def pipedelay(self, pipedelay):
+        self._pipedelay = pipedelay
+        self._pipedelay_ticks = pipedelay*SimSettings.simTicksPerCycle #scaled once here rather than for every packet
 
     def run(self):
         """Activates simpy processes for the IgPort"""
@@ -180,40 +304,53 @@ class IgPort(Component):
 
     def run_pipe(self):
 
-        """Mimics the pieline delay"""
+        """Mimics the pieline delay. The full buffer warning is given at most once, so the check is only made by
+        a first loop run until then; the steady state loop below it does no check at all"""
 
-        while True:
+        get_ingress = self._get_ingress
+        timeout = self._timeout
+        latency = self.latency
 
-            if self.occwarn and not self.warned:
-                if len(self.pipeline.items) == self.depth:
+        if self.occwarn:
+            pipeline_items = self.pipeline.items
+            while not self.warned:
+
+                if len(pipeline_items) == self.depth:
                     print("Warning, @%dbuffer %s in %s is full" %(self.env.now, self.name, self.parentname))            
                     Newsim.Log(self, "WARNING", "buffer %s in %s is full" % (self.name, self.parentname))
                     self.warned = True
 
-            pkt = yield self.ingress.get() #get a packet (header to start processing it) from the ingress buffer xib
+                pkt = yield get_ingress() #get a packet (header to start processing it) from the ingress buffer xib
+                timeout(self._pipedelay_ticks, pkt).callbacks.append(latency)
 
-            self.env.process(self.latency(pkt)) 
+        while True:
 
-    def latency (self, pkt):
-        """ A non blocking process which moves a packet from A to B in two cycles.
-        Multiple instances of this process may be active at once."""
+            pkt = yield get_ingress() #get a packet (header to start processing it) from the ingress buffer xib
 
-        yield self.env.timeout(self.pipedelay*SimSettings.simTicksPerCycle) #simulate the delay to process the packet header
+            #simulate the delay to process the packet header. A timeout with a callback does it: nothing waits
+            #on the pipeline put, so no process is needed per packet
+            timeout(self._pipedelay_ticks, pkt).callbacks.append(latency)
 
-        yield self.pipeline.put(pkt) # put the packet ready to be send on EgPort
+    def latency (self, event):
+        """ A non blocking callback which moves the packet carried by a pipedelay timeout from A to B.
+        Multiple timeouts may be pending at once."""
+
+        self._put_pipeline(event.value) # put the packet ready to be send on EgPort
 
     def put_hdr(self, pkt):
         "External method used to write a packet header to the IgPort"
-        return  self.ingress.put(pkt)
+        return  self._put_ingress(pkt)
 
     def put_tail(self):
         "External method used to write a packet tail to the IgPort"
-        return self.ingress_tail.put("tail")
+        if self.disable_tails:
+            return self.env.event().succeed()
+        return self._put_ingress_tail(_TAIL)
 
     def get_hdr(self):
         "External method used to get a packet header from the IgPort"
 
-        return self.pipeline.get()
+        return self._get_pipeline()
 
     def get_tail(self):
         """Get a get a packet tail from the buffer.
@@ -222,16 +359,21 @@ class IgPort(Component):
         For sims where all packets are the same size this should not matter but
         it ought to be fixed"""
 
-        return self.ingress_tail.get()
+        if self.disable_tails:
+            return self.env.event().succeed()
+        return self._get_ingress_tail()
 
     def run_monitor(self):
         """Simpy process to gather buffer occupancy stats. Only runs if
         self.occwarn=True"""
         
+        add_sampletime = self.stats['sampletimes'].append
+        add_occupancy = self.stats['occupancy'].append
+        pipeline_items = self.pipeline.items
         while True:
-            yield self.env.timeout(self.monitor_interval)
-            self.stats['sampletimes'].append(self.env.now/NewmanConstants.TIMEBASE)
-            self.stats['occupancy'].append(len(self.pipeline.items))
+            yield self._timeout(self.monitor_interval)
+            add_sampletime(self.env.now/NewmanConstants.TIMEBASE)
+            add_occupancy(len(pipeline_items))
 
 class EgPort(Component):
     """EgPorts are paired with IgPorts via a reference
@@ -248,9 +390,21 @@ class EgPort(Component):
 
     def __init__(self, env, name, parentname, link=None, enabled=False):
         Component.__init__(self, env, name, parentname)
+        self._timeout = self.env.timeout
         self.link = link
         self.enabled = enabled
 
+    @property
+    def link(self):
+        return self._link
+
+    @link.setter
+    def link(self, link):
+        # the IgPort is wired after construction (see Router.connect()), its put methods are bound on each wiring
+        self._link = link
+        self._put_hdr = getattr(link, 'put_hdr', None)
+        self._put_tail = getattr(link, 'put_tail', None)
+
     def run(self):
         """Dummy run process for the EgPort"""
 
@@ -265,16 +419,16 @@ class EgPort(Component):
         if self.enabled:
             # put the packet header
 
-            yield self.link.put_hdr(pkt)
+            yield self._put_hdr(pkt)
             # timeout for time taken to send payload
-            yield self.env.timeout(pkt.size * NewmanConstants.TIMEBASE)
+            yield self._timeout(pkt.size * NewmanConstants.TIMEBASE)
 
             #send a 'weightless' tail marker.
-            yield self.link.put_tail()
+            yield self._put_tail()
 
         else:
             Component.Log(self, 'CONFIG_ERROR', "Disabled Port received packet .\
-                              %s. Packet history follows:" %(pkt), pkt=pkt, info=pkt.history)
+                              %s. Packet history follows:" %(pkt), pkt=pkt, infolist=pkt.history)
 
     def check_link(self):
         """Checks that the EgPort is linked to an IgPort instance and not left dangling"""
@@ -399,44 +553,69 @@ class Router(Component):
 
         self.check_conns()
 
+        ig = self.igports
+        eg = self.egports
+        env = self.env
+
+        # the ports of each (northgoing, lane) path seen by run_fromrouter(), resolved once for all of its processes
+        self._route_tbl = {(n, l): (ig['ri' + ('0' if n else '1') + ('a' if l else 'b')],
+                                    eg['re' + ('0' if n else '1') + ('a' if l else 'b')],
+                                    eg['re' + ('n' if n else 's')])
+                           for n in (True, False) for l in (True, False)}
+
         # instantiate port 0 tibs and port 1 xib (all pointing to port1)
-        self.env.process(self.run_fromrouter
-                         (self.igports['ri0a'], self.egports['re1a'], self.egports['bes'],
-                          self.arbre1a, 0, NewmanConstants.TREG_LANEA)
-                        )
-
-        self.env.process(self.run_fromrouter
-                         (self.igports['ri0b'], self.egports['re1b'], self.egports['bes'],
-                          self.arbre1b, 0, NewmanConstants.TREG_LANEB)
-                        )
-
-        self.env.process(self.run_fromblock
-                         (self.igports['bin'], 1,
-                          [self.egports['re1a'], self.egports['re1b']],
-                          [self.arbre1a, self.arbte1b],
-                         )
-                        )
+        env.process(self.run_fromrouter
+                    (ig['ri0a'], eg['re1a'], eg['bes'],
+                     self.arbre1a, 0, NewmanConstants.TREG_LANEA)
+                   )
+
+        env.process(self.run_fromrouter
+                    (ig['ri0b'], eg['re1b'], eg['bes'],
+                     self.arbre1b, 0, NewmanConstants.TREG_LANEB)
+                   )
+
+        env.process(self.run_fromblock
+                    (ig['bin'], 1,
+                     (eg['re1a'], eg['re1b']),
+                     (self.arbre1a, self.arbte1b),
+                    )
+                   )
 
 
         # instantiate port 1 tibs and port 0 xib (all pointing to port0)
-        self.env.process(self.run_fromrouter
-                         (self.igports['ri1a'], self.egports['re0a'], self.egports['ben'],
-                          self.arbre0a, 1, NewmanConstants.TREG_LANEA)
-                        )
-
-        self.env.process(self.run_fromrouter
-                         (self.igports['ri1b'], self.egports['re0b'], self.egports['ben'],
-                          self.arbre0b, 1, NewmanConstants.TREG_LANEB)
-                        )
-
-        yield self.env.process(self.run_fromblock
-                               (self.igports['xis'], 0,
-                               [self.egports['re0a'], self.egports['re0b']],
-                               [self.arbre0a, self.arbte0b],
-                               )
-                              )
+        env.process(self.run_fromrouter
+                    (ig['ri1a'], eg['re0a'], eg['ben'],
+                     self.arbre0a, 1, NewmanConstants.TREG_LANEA)
+                   )
+
+        env.process(self.run_fromrouter
+                    (ig['ri1b'], eg['re0b'], eg['ben'],
+                     self.arbre0b, 1, NewmanConstants.TREG_LANEB)
+                   )
+
+        yield env.process(self.run_fromblock
+                          (ig['xis'], 0,
+                          (eg['re0a'], eg['re0b']),
+                          (self.arbre0a, self.arbte0b),
+                          )
+                         )
         
-    def egress_routing_match (self, packet, lane, egrr):
+    def egress_routing_config (self, egrr):
+        """private method reading the fields of the egress routing register egrr into an EgrrConfig. The registers
+        are not rewritten once the simulation runs, so the TIB processes read them once rather than per packet"""
+
+        config = self.config
+        tilebm = getbyname(config, egrr, 'TILEBM')
+        ipubm = getbyname(config, egrr, 'IPUBM')
+        ipumen = getbyname(config, egrr, 'IPUMEN')
+        tilemen = getbyname(config, egrr, 'TILEMEN')
+        mode = (bool(ipumen) << 1) | bool(tilemen)
+        return EgrrConfig(tilebm, ipubm, ipumen, tilemen,
+                          getbyname(config, egrr, 'EGLANE'),
+                          getbyname(config, egrr, 'PCIEG'),
+                          mode, _egress_matcher(mode, tilebm, ipubm))
+
+    def egress_routing_match (self, packet, lane, egrrcfg):
         """private method for the TR to evaluate whether there is an egress routing match for a given packet
         
             a TR will forward a northgoing (southgoing) packet, ie entering the TR via TIS (TIN) onto XES (XEN) if:
@@ -447,49 +626,27 @@ class Router(Component):
         Arguments:
             packet(ElPktHdr) : The packet to be inspected for match
             lane(int)        : which lane is the packet on? 0:lane A, 1: lane B etc
-            egrr(string)     : the TR egrr control register that presides over the match"""
+            egrrcfg(EgrrConfig): the fields of the TR egrr control register that presides over the match,
+                               see egress_routing_config()"""
 
-        tileid = (packet.tileid & 0x38) >> 3 # the destination XB number
-        
-        tileid_1h = 1 << tileid #one-hot encoding of the destination XB number
-        bcbm = packet.bcbitmap # the broadcast bitmap of the packet
-        match = False
-        tilematch = False
-        ipumatch = False
-
-
-        tilebm = getbyname(self.config, egrr, 'TILEBM') 
-        ipubm = getbyname(self.config, egrr, 'IPUBM')
-        ipumen = getbyname(self.config, egrr, 'IPUMEN')
-        tilemen = getbyname(self.config, egrr, 'TILEMEN')
-        cfglane = getbyname(self.config, egrr, 'EGLANE')
-        
+        cfglane = egrrcfg.eglane
 
         if packet.type == NewmanConstants.EPWR or packet.type == NewmanConstants.EPRD:
-            if getbyname(self.config, egrr, 'PCIEG'): #if this is a packet to host, check whether this is a PCI egress port
-                match = True
+            if egrrcfg.pcieg: #if this is a packet to host, check whether this is a PCI egress port
                 if cfglane != lane: #only egress if the TR ingress lane matches the EGLANE of the Egress routing register
                     Newsim.Log(self, 'CONFIG_ERROR',
-                               "PCI egress packet %s for PCI egress on lane %d (should be on lane==0/A)" % (
-                               packet, lane), packet
+                               "PCI egress packet %s for PCI egress on lane %d (should be on lane==0/A)",
+                               packet, lane, pkt=packet
                               )
-        elif lane == cfglane:
-            if tileid_1h & tilebm:
-                tilematch = True
-            if bcbm & ipubm:
-                ipumatch = True
-            if ipumen:
-                if tilemen:
-                    match = tilematch & ipumatch
-                else:
-                    match = ipumatch
-            elif tilemen:
-                match = tilematch
-            else:
-                match = False
+                return True
+            return False
 
+        if lane != cfglane:
+            return False
 
-        return match
+        # the one-hot destination XB number against TILEBM and/or the broadcast bitmap of the packet against IPUBM,
+        # as selected by IPUMEN/TILEMEN when the register was read (see _egress_matcher())
+        return egrrcfg.match(packet)
 
     def run_fromrouter(self, northgoing, lane):
 
@@ -528,26 +685,30 @@ class Router(Component):
             5. all the steps above just put the packet header. Now, need to wait for the tail to arrive
             before going round the loop again; this is part of the cut through modeling"""
         
-        rigport=self.igports['ri'+('0' if northgoing else '1')+('a' if lane else 'b')]
-        regport=self.egports['re'+('0' if northgoing else '1')+('a' if lane else 'b')]
-        begport=self.egports['re'+('n' if northgoing else 's')]
+        rigport, regport, begport = self._route_tbl[bool(northgoing), bool(lane)]
+
+        # step 1: the egress routing register is read once, not for every packet
+        egrr = 'EGRNR' if northgoing else 'EGRSR'
+        egrrcfg = self.egress_routing_config(egrr)
+        egrrtilebm, egrrbm, egrripumen, cfglane = egrrcfg.tilebm, egrrcfg.ipubm, egrrcfg.ipumen, egrrcfg.eglane
 
         while True:
             # get first packet in tib
             pts = yield rigport.get_hdr()
 
 
-            if self.egress_routing_match(pts, lane, egrr):
+            bcbitmap = pts.bcbitmap
+            if self.egress_routing_match(pts, lane, egrrcfg):
 
                 #adjust bitmap and put the packet to the adapter egress port
                 if egrripumen:
-                    bitmap_egress = pts.bcbitmap & egrrbm
-                    bitmap_onward = bitmap_egress ^ pts.bcbitmap
+                    bitmap_egress = bcbitmap & egrrbm
+                    bitmap_onward = bitmap_egress ^ bcbitmap
                 else:
-                    bitmap_egress = pts.bcbitmap
+                    bitmap_egress = bcbitmap
                     bitmap_onward = 0
             else :
-                bitmap_onward = pts.bcbitmap
+                bitmap_onward = bcbitmap
                 bitmap_egress = 0
 
             # 4a: packet splits and goes to egress and opposite trunk port
@@ -557,21 +718,29 @@ class Router(Component):
                 pts.bcbitmap = bitmap_onward
 
                 with tegarb.request(priority=1) as req:
-                    Newsim.Log(self, 'INFO', "TIB %s sent packet %s to exchange egress port %s and to opposing trunk (ipubm is %x, tilebm is %x)" % (tigport.name, pts, xegport.name, egrrbm, egrrtilebm), pkt=pts)
+                    Newsim.Log(self, 'INFO', "TIB %s sent packet %s to exchange egress port %s and to opposing trunk (ipubm is %x, tilebm is %x)", tigport.name, pts, xegport.name, egrrbm, egrrtilebm, pkt=pts)
                     yield req
-                    yield AllOf (self.env, [self.env.process(tegport.put(pts)), self.env.process(xegport.put(pts_egress))])
+                    if tegport.enabled and xegport.enabled:
+                        # both copies have the same size, so their headers, payload time and tails are sent side
+                        # by side straight into the linked IgPorts rather than through one EgPort.put() process each
+                        yield AllOf (self.env, [tegport.link.put_hdr(pts), xegport.link.put_hdr(pts_egress)])
+                        yield self.env.timeout(pts.size * NewmanConstants.TIMEBASE)
+                        yield AllOf (self.env, [tegport.link.put_tail(), xegport.link.put_tail()])
+                    else:
+                        # EgPort.put() reports the packet routed to a disabled port
+                        yield AllOf (self.env, [self.env.process(tegport.put(pts)), self.env.process(xegport.put(pts_egress))])
 
             # 4b: packet goes just to egress
             elif bitmap_egress:
-                Newsim.Log(self, 'INFO', "TIB %s sent packet %s to exchange egress port %s (ipubm is %x, tilebm is %x)" % (tigport.name, pts, xegport.name, egrrbm, egrrtilebm), pkt=pts)
-                yield self.env.process(xegport.put(pts))
+                Newsim.Log(self, 'INFO', "TIB %s sent packet %s to exchange egress port %s (ipubm is %x, tilebm is %x)", tigport.name, pts, xegport.name, egrrbm, egrrtilebm, pkt=pts)
+                yield from xegport.put(pts)
 
             # 4c: packet goes just to trunk port
             elif bitmap_onward:
                 with tegarb.request(priority=1) as req:
-                    Newsim.Log(self, 'INFO', " TIB %s sent packet %s to opposing trunk (ipubm is %x, tilebm is %x, lane is %d)" % (tigport.name, pts, egrrbm, egrrtilebm, cfglane), pkt=pts)
+                    Newsim.Log(self, 'INFO', " TIB %s sent packet %s to opposing trunk (ipubm is %x, tilebm is %x, lane is %d)", tigport.name, pts, egrrbm, egrrtilebm, cfglane, pkt=pts)
                     yield req
-                    yield self.env.process(tegport.put(pts))
+                    yield from tegport.put(pts)
 
             # 4d: something has gone badly wrong; this should never happen.
             else:
@@ -612,16 +781,15 @@ class Router(Component):
             matchen = getbyname(self.config, 'XIGLRR', 'STILEMEN')
 
         # step 2
-        lane_tid = [
-            getbyname(self.config, 'XIGLRR', 'TID0LANE'),
-            getbyname(self.config, 'XIGLRR', 'TID1LANE'),
-            getbyname(self.config, 'XIGLRR', 'TID2LANE'),
-            getbyname(self.config, 'XIGLRR', 'TID3LANE'),
-            getbyname(self.config, 'XIGLRR', 'TID4LANE'),
-            getbyname(self.config, 'XIGLRR', 'TID5LANE'),
-            getbyname(self.config, 'XIGLRR', 'TID6LANE'),
-            getbyname(self.config, 'XIGLRR', 'TID7LANE')
-        ]
+        # the eight TIDnLANE fields are packed into one int, 4 bits per tile id, looked up with a shift and a mask
+        lane_tid = 0
+        for tid in range(8):
+            lane_tid |= (getbyname(self.config, 'XIGLRR', 'TID%dLANE' % tid) & 0xF) << (tid << 2)
+
+        # the remaining fields the loop needs are read once here as well, not for every packet
+        lanepci = getbyname(self.config, 'XIGLRR', 'LANEPCI')
+        nomatchen = getbyname(self.config, 'XIGLRR', 'NOMATCHEN')
+        lanentm = getbyname(self.config, 'XIGLRR', 'LANENTM')
 
         enabled=getbyname(self.config, 'CSR', 'TREN')
 
@@ -630,28 +798,28 @@ class Router(Component):
             pts = yield xigport.get_hdr()
             pts.history.append(self.fullname)
             if not enabled:
-                Newsim.Log(self, 'CONFIG_ERROR', "Trunk Router %s received a packet %while disabled" % (self.name, pts), infolist="TREN = %x" % enabled)
+                Newsim.Log(self, 'CONFIG_ERROR', "Trunk Router %s received a packet %s while disabled", self.name, pts, infolist=["TREN = %x" % enabled])
 
             # step 4: get bits 5:3 of the tile id
 
             lane = None
 
             if pts.type == 1 or pts.type == 2:
-                lane = getbyname(self.config, 'XIGLRR', 'LANEPCI')
-                Newsim.Log(self, 'INFO', " XIB %s got packet %s, pciaddress is %x lane is %d" % (xigport.name, pts, pts.pciaddress, lane), pts)
+                lane = lanepci
+                Newsim.Log(self, 'INFO', " XIB %s got packet %s, pciaddress is %x lane is %d", xigport.name, pts, pts.pciaddress, lane, pkt=pts)
 
             elif matchen:
                 tileid53 = (pts.tileid & 0x38) >> 3
 
                 #step 5a
-                lane = lane_tid[tileid53]
-                Newsim.Log(self, 'INFO', " XIB %s got packet %s, matchen is %d, tileid is %d, tileid53 is %d, lane is %d" % (xigport.name, pts, matchen, pts.tileid, tileid53, lane), pts)
+                lane = (lane_tid >> (tileid53 << 2)) & 0xF
+                Newsim.Log(self, 'INFO', " XIB %s got packet %s, matchen is %d, tileid is %d, tileid53 is %d, lane is %d", xigport.name, pts, matchen, pts.tileid, tileid53, lane, pkt=pts)
 
             else:
                 #step 5b
-                if getbyname(self.config, 'XIGLRR', 'NOMATCHEN'):
-                    lane = getbyname(self.config, 'XIGLRR', 'LANENTM')
-                    Newsim.Log(self, 'INFO', "XIB for %s using LANENTM for packet %s" % (xigport.name, pts), pts)
+                if nomatchen:
+                    lane = lanentm
+                    Newsim.Log(self, 'INFO', "XIB for %s using LANENTM for packet %s", xigport.name, pts, pkt=pts)
                 # step 5c
                 else:
                     reginfo = [
@@ -659,14 +827,14 @@ class Router(Component):
                         "STILEMEN = %x" % getbyname(self.config, 'XIGLRR', 'STILEMEN')
                     ]
 
-                    Newsim.Log(self, 'CONFIG_ERROR', "XIB for %s got no ingress routing match for packet %s" % (xigport.name, pts), infolist=reginfo)
+                    Newsim.Log(self, 'CONFIG_ERROR', "XIB for %s got no ingress routing match for packet %s", xigport.name, pts, infolist=reginfo)
 
 
             with arbs[lane].request(priority=1) as req:
                 # step 6a: wait for grant to trunk egress port
                 yield req
-                Newsim.Log(self, 'INFO', "TR ingress packet %s routed to %s on lane %d" % (pts, tegports[lane].name, lane), pts)
-                # step 6b:
-                yield self.env.process(tegports[lane].put(pts))
+                Newsim.Log(self, 'INFO', "TR ingress packet %s routed to %s on lane %d", pts, tegports[lane].name, lane, pkt=pts)
+                # step 6b: EgPort.put() runs inline in this process, no Process is spawned just to wait on it
+                yield from tegports[lane].put(pts)
                 # step 6c:
                 yield xigport.get_tail()
@@ -1,4 +1,5 @@
 import simpy
+import logging
 from typing import (ContextManager,
     Generic,
     Optional,
@@ -15,6 +16,7 @@ from simpy.events import Process, Timeout, AnyOf
 from simpy.resources import base
 from simpy.core import BoundClass, Environment, Event
 import time
+from itertools import chain
 from simpy.events import PENDING, EventPriority, URGENT, NORMAL
 
 ResourceType = TypeVar('ResourceType', bound='BaseResource')
@@ -22,9 +24,12 @@ ResourceType = TypeVar('ResourceType', bound='BaseResource')
 class NewEvent(Event):
     """An extension class of the native Simpy Event class.
     The only addition is that the succeed member method can defer the success 
-    of the event to occur at some point in time. 
+    of the event to occur at some point in time. A processed event can also be
+    re-armed, which lets components pool the events no process waits on.
 
     """
+    __slots__ = ('item', 'caller')
+
     def __init__(self, env: 'Environment',item=None,caller=None):
         super().__init__(env)
         self.item=item
@@ -44,7 +49,22 @@ class NewEvent(Event):
 
         self._ok = True
         self._value = value
-        self.env.schedule(self,delay=delay)
+        self.env.schedule(self,NORMAL,delay)
+        return self
+
+    def rearm(self, item=None, callbacks=None) -> 'NewEvent':
+        """Put a processed event back in the pending state with a new item and
+        callbacks list, so that it can be triggered again.
+
+        Returns the event instance.
+
+        Only events no process holds or waits on may be re-armed.
+
+        """
+        self._value = PENDING
+        self._ok = None
+        self.item = item
+        self.callbacks = [] if callbacks is None else callbacks
         return self
 
 class ConcurrentAllOf(NewEvent):
@@ -62,32 +82,66 @@ class ConcurrentAllOf(NewEvent):
         and hence prevent the AllOf event from being successful.
 
     """
+    __slots__ = ('eventList', '_waitIdx')
+
     def __init__(self, env, eventList):
         super().__init__(env)
 
         self.eventList=eventList
+        self._waitIdx=0 # index of the event the check callback is currently waiting on
         self._check()
 
     def _check(self,event=None):
+        # resume the scan from the event we waited on: the ones before it were triggered at the previous
+        # check and are scanned last, in a single pass catching events that reverted to pending
+        eventList=self.eventList
+        start=self._waitIdx
+        pending=next((e for e in chain(range(start,len(eventList)),range(start)) if not eventList[e].triggered),None)
+
+        if pending is None:
+            self.succeed()
+        else:
+            self._waitIdx=pending
+            eventList[pending].callbacks.append(self._check)
+
+class ConcurrentAllOf2(NewEvent):
+    """
+        ConcurrentAllOf specialized for a pair of events, the common case of joining two conditions (e.g. a grant
+        and a credit). Both events are given directly rather than as a list, so unlike with ConcurrentAllOf they
+        cannot be swapped for new events after creation. Both are checked on every wake-up.
+    """
 
-        for e in range(len(self.eventList)):
+    __slots__ = ('a', 'b')
 
-            if not self.eventList[e].triggered:
-                
-                self.eventList[e].callbacks.append(self._check)
-                return
+    def __init__(self, env, a, b):
+        super().__init__(env)
 
-        self.succeed()
+        self.a=a
+        self.b=b
+        self._check()
+
+    def _check(self,event=None):
+
+        if not self.a.triggered:
+            self.a.callbacks.append(self._check)
+        elif not self.b.triggered:
+            self.b.callbacks.append(self._check)
+        else:
+            self.succeed()
 
 class BufferPeek(NewEvent):
     """Generic event for requesting to peek at something from the buffer.
 
     """
 
+    __slots__ = ('resource', 'proc', '_cancelled')
+
     def __init__(self, resource: ResourceType,item=None,caller=None):
-        super().__init__(resource._env,item=item, caller=caller)
+        env = resource._env
+        super().__init__(env,item=item, caller=caller)
         self.resource = resource
-        self.proc = self.env.active_process
+        self._cancelled = False
+        self.proc = env.active_process
 
         resource.peek_queue.append(self)
         # self.callbacks.append(resource._trigger_put)
@@ -117,7 +171,8 @@ class BufferPeek(NewEvent):
 
         """
         if not self.triggered:
-            self.resource.peek_queue.remove(self)
+            # tombstone: the resource drops the event once it reaches the head of its queue
+            self._cancelled = True
 
 class BufferGet(NewEvent):
     """Generic event for requesting to get something from the *resource*.
@@ -134,10 +189,14 @@ class BufferGet(NewEvent):
 
     """
 
+    __slots__ = ('resource', 'proc', '_cancelled')
+
     def __init__(self, resource: ResourceType,item=None,caller=None):
-        super().__init__(resource._env,item=item,caller=caller)
+        env = resource._env
+        super().__init__(env,item=item,caller=caller)
         self.resource = resource
-        self.proc = self.env.active_process
+        self._cancelled = False
+        self.proc = env.active_process
         resource.get_queue.append(self)
 
         # self.callbacks.append(resource._trigger_put)
@@ -168,7 +227,7 @@ class BufferGet(NewEvent):
 
         """
         if not self.triggered:
-            self.resource.get_queue.remove(self)
+            self._cancelled = True
 
 class BufferPut(NewEvent):
     """Generic event for requesting to put something into the *resource*.
@@ -185,10 +244,14 @@ class BufferPut(NewEvent):
 
     """
 
+    __slots__ = ('resource', 'proc', '_cancelled')
+
     def __init__(self, resource: ResourceType, item:Any,caller=None):
-        super().__init__(resource._env,item,caller=caller)
+        env = resource._env
+        super().__init__(env,item,caller=caller)
         self.resource = resource
-        self.proc: Optional[Process] = self.env.active_process
+        self._cancelled = False
+        self.proc: Optional[Process] = env.active_process
         resource.put_queue.append(self)
 
         resource._trigger_put(None)
@@ -217,7 +280,7 @@ class BufferPut(NewEvent):
 
         """
         if not self.triggered:
-            self.resource.put_queue.remove(self)
+            self._cancelled = True
 
 class PipelinePut(NewEvent):
     """Generic event for requesting to put something into the *resource*.
@@ -234,12 +297,15 @@ class PipelinePut(NewEvent):
 
     """
 
+    __slots__ = ('resource', 'proc', '_cancelled')
+
     def __init__(self, resource: ResourceType, item:Any,caller=None):
-        super().__init__(resource.env,item, caller=caller)
+        env = resource.env
+        super().__init__(env,item, caller=caller)
         self.resource = resource
-        self.proc: Optional[Process] = self.env.active_process
+        self._cancelled = False
+        self.proc: Optional[Process] = env.active_process
         resource.put_queue.append(self)
-        self.callbacks.append(self.resource._putReady)
         resource._trigger_put()
 
     def __enter__(self) -> 'PipelinePut':
@@ -266,7 +332,7 @@ class PipelinePut(NewEvent):
 
         """
         if not self.triggered:
-            self.resource.put_queue.remove(self)
+            self._cancelled = True
 
 class CrossbarGet(NewEvent):
     """An Event to retrieve a single packet chosen from multiple upstream ports
@@ -275,15 +341,25 @@ class CrossbarGet(NewEvent):
         * 
     """
 
+    __slots__ = ('xbar',)
+
     def __init__(self, xbar, outPort=0):
 
         super().__init__(xbar.env, item=outPort)
 
         self.xbar=xbar
         self.xbar.get_queues[outPort].append(self)
-        self.xbar.Log('DEBUG','Get from outPort {} is Requested'.format(self.item))
-
-        unMaskedInPorts=[inPort for inPort in range(self.xbar.inPorts) if (self.xbar.routes[inPort]==outPort and self.xbar.unMaskEvents[inPort].triggered)]
-
-        if unMaskedInPorts:
-            self.xbar._schedule_arbitration(self.xbar.unMaskEvents[unMaskedInPorts[0]])
\ No newline at end of file
+        if self.xbar.logger.isEnabledFor(logging.DEBUG):
+            self.xbar.Log('DEBUG','Get from outPort {} is Requested'.format(self.item))
+
+        # only the first unmasked inPort routed to outPort is needed to schedule the arbitration.
+        # the xbar keeps the inPorts routed to each outPort as a bitmask, so only those are visited
+        unMaskEvents=xbar.unMaskEvents
+        routedMask=xbar._routedMask[outPort]
+        while routedMask:
+            bit=routedMask & -routedMask
+            unMaskEvent=unMaskEvents[bit.bit_length()-1]
+            if unMaskEvent.triggered:
+                xbar._schedule_arbitration(unMaskEvent)
+                break
+            routedMask^=bit
@@ -1,3 +1,5 @@
+# Flow control smoke test. Long runs can be done under PyPy as is: pypy3 testFC.py
+import logging
 from simpy import Environment
 from Components.BasicComponent import Unit
 from Components.Packets import BasePacket
@@ -20,22 +22,29 @@ class TestFlowControl(Unit):
 
     def sendProcess(self):
 
+        # packets come from the BasePacket pool, those released by retrievalProcess are reused
+        acquire=BasePacket.acquire
+        put=self.pipe.put
         for idx in range(10):
-            pkt=BasePacket()
-            yield self.pipe.put(pkt)
-            print('@{} : Finished sending packet {} down the pipeline'.format(self.env.now,idx))
+            yield put(acquire())
+            if self._inf:
+                self.Log('INFO','Finished sending packet %d down the pipeline',idx)
 
     def retrievalProcess(self):
         idx=0
         while True:
             pkt=yield self.dataBuff.get()
-            print('@{} : Reading packet {} from the buffer. Sending a credit back to the source'.format(self.env.now,idx))
+            if self._inf:
+                self.Log('INFO','Reading packet %d from the buffer. Sending a credit back to the source',idx)
+            pkt.release()
             idx+=1
 
 
 
+logging.basicConfig(format='%(message)s')
+
 env=Environment()
 
-TestFlowControl(env)
+TestFlowControl(env).setLogLevel(logging.INFO)
 
 env.run(until=1000)